@@ -2,14 +2,16 @@
 """
 Deployment script for DevOps Intelligence Agent
 """
-import boto3
 import argparse
 import time
 import sys
 from pathlib import Path
 
-def deploy_cloudformation(environment, region):
+def deploy_cloudformation(environment, region, poll_delay=5, poll_attempts=720):
     """Deploy CloudFormation stack"""
+    # Imported here so --skip-infra runs don't pay for loading boto3
+    import boto3
+    
     print(f"Deploying to {environment} in {region}...")
     
     cfn = boto3.client('cloudformation', region_name=region)
@@ -25,7 +27,11 @@ def deploy_cloudformation(environment, region):
         try:
             cfn.describe_stacks(StackName=stack_name)
             stack_exists = True
-        except:
+        except cfn.exceptions.ClientError as e:
+            # A missing stack is reported as a ValidationError; anything
+            # else (credentials, throttling) is a real failure
+            if e.response['Error']['Code'] != 'ValidationError':
+                raise
             stack_exists = False
         
         if stack_exists:
@@ -57,7 +63,10 @@ def deploy_cloudformation(environment, region):
         print("Waiting for stack operation to complete...")
         waiter_name = 'stack_update_complete' if stack_exists else 'stack_create_complete'
         waiter = cfn.get_waiter(waiter_name)
-        waiter.wait(StackName=stack_name)
+        waiter.wait(
+            StackName=stack_name,
+            WaiterConfig={'Delay': poll_delay, 'MaxAttempts': poll_attempts}
+        )
         
         print("✓ Stack deployment completed successfully!")
         
@@ -102,6 +111,18 @@ def main():
         default='us-east-1',
         help='AWS region'
     )
+    parser.add_argument(
+        '--poll-delay',
+        type=int,
+        default=5,
+        help='Seconds between stack status checks'
+    )
+    parser.add_argument(
+        '--poll-attempts',
+        type=int,
+        default=720,
+        help='Maximum stack status checks before giving up (default: 1 hour at 5s)'
+    )
     parser.add_argument(
         '--skip-infra',
         action='store_true',
@@ -116,7 +137,12 @@ def main():
     
     # Deploy infrastructure
     if not args.skip_infra:
-        if not deploy_cloudformation(args.environment, args.region):
+        if not deploy_cloudformation(
+            args.environment,
+            args.region,
+            poll_delay=args.poll_delay,
+            poll_attempts=args.poll_attempts
+        ):
             print("\n✗ Infrastructure deployment failed!")
             sys.exit(1)
     
@@ -0,0 +1,129 @@
+"""
+Micro-batching dispatcher for Bedrock invoke_model calls
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BedrockBatcher:
+    """
+    Groups invoke_model requests that arrive close together and
+    dispatches each group as one concurrent wave
+    
+    Bedrock has no multi-prompt invoke_model, so a batch is sent as
+    concurrent calls capped by a semaphore. A request that arrives with
+    nothing else queued is dispatched at once; otherwise the collection
+    window adapts to load: it widens with the smoothed batch size so
+    bursts are grouped and shrinks back to the minimum when traffic is light.
+    """
+    
+    def __init__(
+        self,
+        client,
+        max_batch_size: int = 8,
+        max_concurrency: int = 16,
+        min_window: float = 0.005,
+        max_window: float = 0.05,
+        target_latency: float = 0.002
+    ):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.min_window = min_window
+        self.max_window = max_window
+        self.target_latency = target_latency
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._depth_ema = 0.0
+    
+    async def start(self):
+        """Start the background dispatcher"""
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the dispatcher and wait for in-flight calls to finish"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        # Fail anything still queued so callers don't wait forever
+        while self._queue and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Bedrock batcher stopped"))
+        
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+    
+    async def invoke_model(self, **kwargs) -> Dict[str, Any]:
+        """Queue an invoke_model call and wait for its response"""
+        if self._worker is None:
+            # Not started: call through directly
+            return await self.client.invoke_model(**kwargs)
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((kwargs, future))
+        return await future
+    
+    def _window(self) -> float:
+        """Current collection window in seconds"""
+        return min(
+            self.max_window,
+            max(self.min_window, self._depth_ema * self.target_latency)
+        )
+    
+    async def _run(self):
+        """Collect requests into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            # A lone request has nothing to wait for
+            deadline = loop.time() + self._window() if not self._queue.empty() else 0.0
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Smooth the observed load (batch plus backlog) for the next window
+            depth = len(batch) + self._queue.qsize()
+            self._depth_ema = 0.8 * self._depth_ema + 0.2 * depth
+            
+            logger.debug("Dispatching Bedrock batch of %d (window %.3fs)", len(batch), self._window())
+            
+            for request in batch:
+                task = asyncio.create_task(self._dispatch(request))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, request: Tuple[Dict[str, Any], asyncio.Future]):
+        """Send one request, bounded by the concurrency limit"""
+        kwargs, future = request
+        
+        async with self._semaphore:
+            try:
+                response = await self.client.invoke_model(**kwargs)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+        
+        if not future.done():
+            future.set_result(response)
@@ -1,21 +1,38 @@
 """
 AWS Bedrock Agent Implementation with Reasoning Capabilities
 """
-import json
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
-import boto3
-from datetime import datetime
+import uuid
+from contextlib import AsyncExitStack
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+import aioboto3
+import orjson
+from datetime import datetime, timedelta, timezone
 
 from src.config import settings
+from src.utils.aws import AWS_CLIENT_CONFIG, BEDROCK_CLIENT_CONFIG
+from src.agent.batcher import BedrockBatcher
 from src.agent.tools import ToolRegistry
-from src.agent.reasoning import ReasoningEngine
+from src.agent.reasoning import ReasoningEngine, PlanCache, HISTORY_WINDOW, PROMPT_FINGERPRINT
+from src.agent.semantic_cache import AnswerCache
 # Use DynamoDB for persistent storage (infrastructure is now deployed)
 from src.storage.dynamodb import ConversationStore
 
 
 logger = logging.getLogger(__name__)
 
+# Read-only tools that may start before the streamed plan is complete
+_SPECULATIVE_TOOLS = frozenset({
+    'aws_infrastructure',
+    'cost_analysis',
+    'code_analysis',
+    'knowledge_base',
+    'web_search'
+})
+
+_RESPONSE_FALLBACK_MESSAGE = "I've processed your request. Please check the action results for details."
+
 
 class DevOpsAgent:
     """
@@ -26,32 +43,93 @@ class DevOpsAgent:
     def __init__(self):
         self.bedrock_runtime = None
         self.bedrock_agent = None
+        self.bedrock_batcher = None
         self.tool_registry = None
         self.reasoning_engine = None
         self.conversation_store = None
+        self._aws_session = None
+        self._exit_stack = None
+        self._dynamodb = None
+        self._actions_table = None
+        
+        # Model family is fixed by configuration, so pick the
+        # request/response format once instead of on every call
+        self._is_anthropic = "anthropic" in settings.BEDROCK_MODEL_ID.lower()
+        if self._is_anthropic:
+            self._build_body = self._build_body_anthropic
+            self._parse_body = self._parse_body_anthropic
+            self._parse_stream_chunk = self._parse_stream_chunk_anthropic
+        else:
+            self._build_body = self._build_body_nova
+            self._parse_body = self._parse_body_nova
+            self._parse_stream_chunk = self._parse_stream_chunk_nova
         
     async def initialize(self):
         """Initialize AWS clients and agent components"""
         try:
-            # Initialize AWS clients
-            self.bedrock_runtime = boto3.client(
-                'bedrock-runtime',
-                region_name=settings.AWS_REGION
+            # Initialize AWS clients once so connections are reused across requests
+            self._aws_session = aioboto3.Session()
+            self._exit_stack = AsyncExitStack()
+            
+            self.bedrock_runtime = await self._exit_stack.enter_async_context(
+                self._aws_session.client(
+                    'bedrock-runtime',
+                    region_name=settings.AWS_REGION,
+                    config=BEDROCK_CLIENT_CONFIG
+                )
             )
             
-            self.bedrock_agent = boto3.client(
-                'bedrock-agent-runtime',
-                region_name=settings.AWS_REGION
+            self.bedrock_agent = await self._exit_stack.enter_async_context(
+                self._aws_session.client(
+                    'bedrock-agent-runtime',
+                    region_name=settings.AWS_REGION,
+                    config=BEDROCK_CLIENT_CONFIG
+                )
             )
             
+            # Group concurrent invoke_model calls across sessions
+            if settings.ENABLE_BEDROCK_BATCHING:
+                self.bedrock_batcher = BedrockBatcher(
+                    self.bedrock_runtime,
+                    max_batch_size=settings.BEDROCK_BATCH_MAX_SIZE,
+                    max_concurrency=settings.BEDROCK_BATCH_MAX_CONCURRENCY,
+                    max_window=settings.BEDROCK_BATCH_MAX_WINDOW
+                )
+                await self.bedrock_batcher.start()
+            
+            self._dynamodb = await self._exit_stack.enter_async_context(
+                self._aws_session.resource(
+                    'dynamodb',
+                    region_name=settings.AWS_REGION,
+                    config=AWS_CLIENT_CONFIG
+                )
+            )
+            self._actions_table = await self._dynamodb.Table(settings.DYNAMODB_ACTIONS_TABLE)
+            
             # Initialize tool registry
             self.tool_registry = ToolRegistry()
             await self.tool_registry.initialize()
             
+            answer_cache = None
+            if settings.ENABLE_SEMANTIC_CACHE:
+                answer_cache = AnswerCache(
+                    client=self.bedrock_batcher or self.bedrock_runtime,
+                    embedding_model_id=settings.EMBEDDING_MODEL_ID,
+                    prompt_fingerprint=settings.BEDROCK_MODEL_ID + PROMPT_FINGERPRINT,
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS
+                )
+            
             # Initialize reasoning engine
             self.reasoning_engine = ReasoningEngine(
                 bedrock_client=self.bedrock_runtime,
-                model_id=settings.BEDROCK_MODEL_ID
+                model_id=settings.BEDROCK_MODEL_ID,
+                latency_optimized=settings.BEDROCK_LATENCY_OPTIMIZED,
+                prompt_cache=settings.ENABLE_PROMPT_CACHE,
+                batcher=self.bedrock_batcher,
+                answer_cache=answer_cache,
+                plan_cache=PlanCache(settings.PLAN_CACHE_MAX_ENTRIES) if settings.ENABLE_PLAN_CACHE else None
             )
             
             # Initialize conversation store
@@ -61,7 +139,7 @@ class DevOpsAgent:
             logger.info("DevOps Agent initialized successfully")
             
         except Exception as e:
-            logger.error(f"Failed to initialize agent: {e}")
+            logger.exception("Failed to initialize agent: %s", e)
             raise
     
     async def process_message(
@@ -81,45 +159,36 @@ class DevOpsAgent:
         Returns:
             Agent response with actions taken
         """
+        received_at = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+        
         try:
-            # Retrieve conversation history
-            history = await self.conversation_store.get_history(session_id)
-            
-            # Store user message
-            await self.conversation_store.add_message(
+            history, reasoning_result, execution_results = await self._prepare_turn(
+                message=message,
                 session_id=session_id,
-                role="user",
-                content=message
-            )
-            
-            # Reasoning phase: Analyze the request and plan actions
-            reasoning_result = await self.reasoning_engine.reason(
-                query=message,
-                history=history,
-                available_tools=self.tool_registry.get_tool_definitions(),
                 context=context
             )
             
-            logger.info(f"Reasoning completed: {reasoning_result['plan']}")
-            
-            # Execution phase: Execute planned actions
-            execution_results = await self._execute_plan(
-                plan=reasoning_result['plan'],
-                session_id=session_id
-            )
-            
-            # Generate final response
-            final_response = await self._generate_response(
-                reasoning=reasoning_result,
-                execution_results=execution_results,
-                history=history
-            )
+            if self._is_direct_answer(reasoning_result):
+                # Nothing to execute: reasoning already answered the user,
+                # so skip the second LLM call
+                final_response = {
+                    "message": reasoning_result['user_facing_summary'],
+                    "requires_approval": False
+                }
+            else:
+                # Generate final response
+                final_response = await self._generate_response(
+                    reasoning=reasoning_result,
+                    execution_results=execution_results,
+                    history=history
+                )
             
-            # Store agent response
-            await self.conversation_store.add_message(
+            # Store the user message and agent response in one batch
+            await self._store_turn(
                 session_id=session_id,
-                role="assistant",
-                content=final_response['message']
+                message=message,
+                received_at=received_at,
+                response=final_response['message']
             )
             
             return {
@@ -128,64 +197,362 @@ class DevOpsAgent:
                 "actions_taken": execution_results,
                 "requires_approval": final_response.get('requires_approval', False),
                 "session_id": session_id,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
-            logger.error(f"Error processing message: {e}", exc_info=True)
+            logger.exception("Error processing message: %s", e)
             return {
                 "message": "I encountered an error processing your request. Please try again.",
                 "error": str(e),
                 "session_id": session_id
             }
     
-    async def _execute_plan(
+    async def process_message_stream(
         self,
-        plan: List[Dict[str, Any]],
-        session_id: str
-    ) -> List[Dict[str, Any]]:
-        """Execute the planned actions"""
-        results = []
+        message: str,
+        session_id: str,
+        context: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user message and stream the final response
         
-        for step in plan:
-            tool_name = step.get('tool')
-            tool_input = step.get('input', {})
+        Yields events in order:
+            {"type": "reasoning_delta", "text": ...}: Reasoning text as the model writes it
+            {"type": "reasoning", ...}: Reasoning and executed actions
+            {"type": "delta", "text": ...}: Response text as it is generated
+            {"type": "done", ...}: Same payload as process_message
+            {"type": "error", ...}: Emitted instead of "done" on failure
+        """
+        received_at = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+        
+        try:
+            history = await self._get_history(session_id)
             
+            reasoning_result = None
+            speculative = None
             try:
-                # Check if human approval is required
-                if step.get('requires_approval') and settings.ENABLE_HUMAN_APPROVAL:
-                    # Store pending action for approval
-                    await self._store_pending_action(session_id, step)
-                    results.append({
-                        "tool": tool_name,
-                        "status": "pending_approval",
-                        "message": "Action requires human approval"
-                    })
-                    continue
-                
-                # Execute the tool
-                tool_result = await self.tool_registry.execute_tool(
-                    tool_name=tool_name,
-                    tool_input=tool_input
-                )
-                
-                results.append({
-                    "tool": tool_name,
-                    "status": "success",
-                    "result": tool_result
-                })
+                async for event in self.reasoning_engine.reason_stream(
+                    query=message,
+                    history=history,
+                    available_tools=self.tool_registry.get_tool_definitions(),
+                    context=context
+                ):
+                    if event['type'] == "result":
+                        reasoning_result = event['result']
+                    elif event['type'] == "plan_step":
+                        # Run the first step while the rest of the plan streams
+                        speculative = self._start_speculative_step(event['step'], session_id)
+                    else:
+                        yield event
                 
-                logger.info(f"Executed tool {tool_name}: {tool_result.get('message', 'Success')}")
+                if reasoning_result is None:
+                    raise RuntimeError("Reasoning stream ended without a result")
                 
-            except Exception as e:
-                logger.error(f"Error executing tool {tool_name}: {e}")
-                results.append({
-                    "tool": tool_name,
-                    "status": "error",
-                    "error": str(e)
-                })
+                execution_results = await self._run_plan(reasoning_result, session_id, speculative)
+            finally:
+                # No-op once the plan has run; stops an orphaned tool call
+                # when reasoning fails or the client disconnects
+                if speculative:
+                    speculative[1].cancel()
+            
+            yield {
+                "type": "reasoning",
+                "reasoning": reasoning_result['reasoning'],
+                "actions_taken": execution_results
+            }
+            
+            if self._is_direct_answer(reasoning_result):
+                final_message = reasoning_result['user_facing_summary']
+                yield {"type": "delta", "text": final_message}
+            else:
+                parts = []
+                async for text in self._stream_response(
+                    reasoning=reasoning_result,
+                    execution_results=execution_results
+                ):
+                    parts.append(text)
+                    yield {"type": "delta", "text": text}
+                final_message = "".join(parts)
+            
+            # Store the turn once the stream completes
+            await self._store_turn(
+                session_id=session_id,
+                message=message,
+                received_at=received_at,
+                response=final_message
+            )
+            
+            yield {
+                "type": "done",
+                "message": final_message,
+                "reasoning": reasoning_result['reasoning'],
+                "actions_taken": execution_results,
+                "requires_approval": self._requires_approval(execution_results),
+                "session_id": session_id,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            
+        except Exception as e:
+            logger.exception("Error streaming message: %s", e)
+            yield {
+                "type": "error",
+                "message": "I encountered an error processing your request. Please try again.",
+                "error": str(e),
+                "session_id": session_id
+            }
+    
+    async def _prepare_turn(
+        self,
+        message: str,
+        session_id: str,
+        context: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any], List[Dict[str, Any]]]:
+        """Run the reasoning and execution phases"""
+        history = await self._get_history(session_id)
+        
+        # Reasoning phase: Analyze the request and plan actions.
+        # The user message is stored with the response in _store_turn.
+        reasoning_result = await self.reasoning_engine.reason(
+            query=message,
+            history=history,
+            available_tools=self.tool_registry.get_tool_definitions(),
+            context=context
+        )
+        
+        execution_results = await self._run_plan(reasoning_result, session_id)
         
-        return results
+        return history, reasoning_result, execution_results
+    
+    async def _get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        """Retrieve only the history the reasoning prompt uses"""
+        since = None
+        if settings.HISTORY_MAX_AGE_HOURS > 0:
+            since = (datetime.now(timezone.utc) - timedelta(hours=settings.HISTORY_MAX_AGE_HOURS)).isoformat(timespec='microseconds')
+        
+        return await self.conversation_store.get_history(
+            session_id,
+            limit=HISTORY_WINDOW,
+            since=since
+        )
+    
+    async def _run_plan(
+        self,
+        reasoning_result: Dict[str, Any],
+        session_id: str,
+        speculative: Optional[Tuple[Dict[str, Any], asyncio.Task]] = None
+    ) -> List[Dict[str, Any]]:
+        """Execute the reasoning plan shared by both entry points"""
+        logger.info("Reasoning completed: %s", reasoning_result['plan'])
+        
+        if self._is_direct_answer(reasoning_result):
+            if speculative:
+                speculative[1].cancel()
+            return []
+        
+        # Execution phase: Execute planned actions
+        execution_results = await self._execute_plan(
+            plan=reasoning_result['plan'],
+            session_id=session_id,
+            speculative=speculative
+        )
+        
+        # A cached plan whose tools fail may be stale; let the LLM replan next time
+        intent = reasoning_result.get('plan_intent')
+        if intent and self.reasoning_engine.plan_cache and self._has_failures(execution_results):
+            self.reasoning_engine.plan_cache.invalidate(intent)
+        
+        return execution_results
+    
+    async def _store_turn(
+        self,
+        session_id: str,
+        message: str,
+        received_at: str,
+        response: str
+    ):
+        """Persist the user message and agent response with a single batch write"""
+        await self.conversation_store.add_messages(
+            session_id=session_id,
+            messages=[
+                {"role": "user", "content": message, "timestamp": received_at},
+                {"role": "assistant", "content": response}
+            ]
+        )
+    
+    @staticmethod
+    def _has_failures(execution_results: List[Dict[str, Any]]) -> bool:
+        """Whether any executed step errored or its tool reported failure"""
+        return any(
+            result['status'] == "error"
+            or result.get('result', {}).get('success') is False
+            for result in execution_results
+        )
+    
+    @staticmethod
+    def _is_direct_answer(reasoning_result: Dict[str, Any]) -> bool:
+        """Whether reasoning answered the user without needing any tools"""
+        return not reasoning_result['plan'] and bool(reasoning_result.get('user_facing_summary'))
+    
+    @staticmethod
+    def _requires_approval(execution_results: List[Dict[str, Any]]) -> bool:
+        """Check if any actions require approval"""
+        return any(
+            r.get('status') == 'pending_approval'
+            for r in execution_results
+        )
+    
+    def _start_speculative_step(
+        self,
+        step: Dict[str, Any],
+        session_id: str
+    ) -> Optional[Tuple[Dict[str, Any], asyncio.Task]]:
+        """Start a streamed plan step early if it is safe to run before the plan is final"""
+        if (
+            step.get('tool') not in _SPECULATIVE_TOOLS
+            or step.get('requires_approval')
+            or step.get('depends_on')
+        ):
+            return None
+        
+        logger.info("Speculatively executing %s", step.get('tool'))
+        return step, asyncio.create_task(self._execute_step(step, session_id, []))
+    
+    async def _execute_plan(
+        self,
+        plan: List[Dict[str, Any]],
+        session_id: str,
+        speculative: Optional[Tuple[Dict[str, Any], asyncio.Task]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute the planned actions
+        
+        Steps are scheduled in waves: every step whose ``depends_on``
+        steps have finished runs concurrently with the rest of its wave.
+        Results are returned in plan order.
+        
+        speculative is a (step, task) pair already started while the plan
+        was streaming; its result is reused if the final plan contains the
+        same step, otherwise the task is cancelled.
+        """
+        speculative_index, speculative_task = None, None
+        if speculative:
+            speculative_step, speculative_task = speculative
+            speculative_index = next(
+                (index for index, step in enumerate(plan) if step == speculative_step),
+                None
+            )
+            if speculative_index is None:
+                speculative_task.cancel()
+        
+        step_ids = [step.get('step', index + 1) for index, step in enumerate(plan)]
+        known_ids = set(step_ids)
+        results: Dict[int, Dict[str, Any]] = {}
+        # (step result, write task) for pending actions stored in the background
+        pending_writes: List[Tuple[Dict[str, Any], asyncio.Task]] = []
+        completed = set()
+        remaining = list(range(len(plan)))
+        
+        while remaining:
+            ready = [
+                index for index in remaining
+                if all(
+                    dep in completed
+                    for dep in plan[index].get('depends_on') or []
+                    if dep in known_ids
+                )
+            ]
+            
+            if not ready:
+                # Circular dependencies: nothing left can be scheduled
+                for index in remaining:
+                    results[index] = {
+                        "tool": plan[index].get('tool'),
+                        "status": "error",
+                        "error": "Step dependencies could not be resolved"
+                    }
+                break
+            
+            wave_results = await asyncio.gather(*(
+                speculative_task if index == speculative_index
+                else self._execute_step(plan[index], session_id, pending_writes)
+                for index in ready
+            ))
+            
+            for index, result in zip(ready, wave_results):
+                results[index] = result
+                completed.add(step_ids[index])
+            
+            remaining = [index for index in remaining if index not in results]
+        
+        if pending_writes:
+            write_outcomes = await asyncio.gather(
+                *(task for _, task in pending_writes),
+                return_exceptions=True
+            )
+            for (result, _), outcome in zip(pending_writes, write_outcomes):
+                if isinstance(outcome, Exception):
+                    logger.error("Error storing pending action for %s: %s", result['tool'], outcome)
+                    result.pop('action_id', None)
+                    result.pop('message', None)
+                    result['status'] = "error"
+                    result['error'] = str(outcome)
+        
+        return [results[index] for index in range(len(plan))]
+    
+    async def _execute_step(
+        self,
+        step: Dict[str, Any],
+        session_id: str,
+        pending_writes: List[Tuple[Dict[str, Any], asyncio.Task]]
+    ) -> Dict[str, Any]:
+        """
+        Execute a single plan step
+        
+        Steps that need approval are stored in the background; the write
+        task is appended to pending_writes for the caller to await.
+        """
+        tool_name = step.get('tool')
+        tool_input = step.get('input', {})
+        
+        try:
+            # Check if human approval is required
+            if step.get('requires_approval') and settings.ENABLE_HUMAN_APPROVAL:
+                # Store pending action for approval without blocking the plan
+                action_id = self._new_action_id(session_id)
+                result = {
+                    "tool": tool_name,
+                    "status": "pending_approval",
+                    "action_id": action_id,
+                    "message": "Action requires human approval"
+                }
+                pending_writes.append((
+                    result,
+                    asyncio.create_task(self._store_pending_action(session_id, action_id, step))
+                ))
+                return result
+            
+            # Execute the tool
+            tool_result = await self.tool_registry.execute_tool(
+                tool_name=tool_name,
+                tool_input=tool_input
+            )
+            
+            logger.info("Executed tool %s: %s", tool_name, tool_result.get('message', 'Success'))
+            
+            return {
+                "tool": tool_name,
+                "status": "success",
+                "result": tool_result
+            }
+            
+        except Exception as e:
+            logger.exception("Error executing tool %s: %s", tool_name, e)
+            return {
+                "tool": tool_name,
+                "status": "error",
+                "error": str(e)
+            }
     
     async def _generate_response(
         self,
@@ -194,14 +561,73 @@ class DevOpsAgent:
         history: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """Generate final response using LLM"""
+        request_body = self._build_response_request(reasoning, execution_results)
         
-        # Prepare context for response generation
-        context = {
-            "reasoning": reasoning['reasoning'],
-            "plan": reasoning['plan'],
-            "execution_results": execution_results
-        }
+        try:
+            invoke_model = (self.bedrock_batcher or self.bedrock_runtime).invoke_model
+            response = await invoke_model(
+                modelId=settings.BEDROCK_MODEL_ID,
+                body=orjson.dumps(request_body),
+                **self._invoke_kwargs()
+            )
+            
+            response_body = orjson.loads(await response['body'].read())
+            
+            return {
+                "message": self._parse_body(response_body),
+                "requires_approval": self._requires_approval(execution_results)
+            }
+            
+        except Exception as e:
+            logger.exception("Error generating response: %s", e)
+            return {
+                "message": _RESPONSE_FALLBACK_MESSAGE,
+                "requires_approval": False
+            }
+    
+    async def _stream_response(
+        self,
+        reasoning: Dict[str, Any],
+        execution_results: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        """Generate the final response with the LLM, yielding text as it arrives"""
+        request_body = self._build_response_request(reasoning, execution_results)
+        streamed_any = False
         
+        try:
+            response = await self.bedrock_runtime.invoke_model_with_response_stream(
+                modelId=settings.BEDROCK_MODEL_ID,
+                body=orjson.dumps(request_body),
+                **self._invoke_kwargs()
+            )
+            
+            async for event in response['body']:
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+                
+                text = self._parse_stream_chunk(orjson.loads(chunk['bytes']))
+                if text:
+                    streamed_any = True
+                    yield text
+                    
+        except Exception as e:
+            logger.exception("Error streaming response: %s", e)
+            if not streamed_any:
+                yield _RESPONSE_FALLBACK_MESSAGE
+    
+    def _invoke_kwargs(self) -> Dict[str, Any]:
+        """Optional invoke_model arguments shared by all response calls"""
+        if settings.BEDROCK_LATENCY_OPTIMIZED:
+            return {'performanceConfigLatency': 'optimized'}
+        return {}
+    
+    def _build_response_request(
+        self,
+        reasoning: Dict[str, Any],
+        execution_results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the Bedrock request body for response generation"""
         # Create prompt for response generation
         prompt = f"""You are a DevOps Intelligence Agent. Based on the following information, 
 generate a clear, helpful response to the user.
@@ -209,7 +635,7 @@ generate a clear, helpful response to the user.
 Reasoning: {reasoning['reasoning']}
 
 Actions Taken:
-{json.dumps(execution_results, indent=2)}
+{orjson.dumps(execution_results, option=orjson.OPT_INDENT_2).decode()}
 
 Provide a natural, conversational response that:
 1. Summarizes what you understood about their request
@@ -219,95 +645,95 @@ Provide a natural, conversational response that:
 
 Response:"""
 
-        try:
-            # Prepare request body based on model type
-            if "anthropic" in settings.BEDROCK_MODEL_ID.lower():
-                request_body = {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.7
+        return self._build_body(prompt)
+    
+    @staticmethod
+    def _build_body_anthropic(prompt: str) -> Dict[str, Any]:
+        """Build the response request body in Anthropic Claude format"""
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
                 }
-            else:
-                # Amazon Nova format
-                request_body = {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [{"text": prompt}]
-                        }
-                    ],
-                    "inferenceConfig": {
-                        "maxTokens": 2000,
-                        "temperature": 0.7
-                    }
+            ],
+            "temperature": 0.7
+        }
+    
+    @staticmethod
+    def _build_body_nova(prompt: str) -> Dict[str, Any]:
+        """Build the response request body in Amazon Nova format"""
+        return {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"text": prompt}]
                 }
-            
-            response = self.bedrock_runtime.invoke_model(
-                modelId=settings.BEDROCK_MODEL_ID,
-                body=json.dumps(request_body)
-            )
-            
-            response_body = json.loads(response['body'].read())
-            
-            # Parse response based on model type
-            if "anthropic" in settings.BEDROCK_MODEL_ID.lower():
-                message = response_body['content'][0]['text']
-            else:
-                message = response_body['output']['message']['content'][0]['text']
-            
-            # Check if any actions require approval
-            requires_approval = any(
-                r.get('status') == 'pending_approval' 
-                for r in execution_results
-            )
-            
-            return {
-                "message": message,
-                "requires_approval": requires_approval
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return {
-                "message": "I've processed your request. Please check the action results for details.",
-                "requires_approval": False
+            ],
+            "inferenceConfig": {
+                "maxTokens": 2000,
+                "temperature": 0.7
             }
+        }
+    
+    @staticmethod
+    def _parse_body_anthropic(response_body: Dict[str, Any]) -> str:
+        """Extract the completion text from an Anthropic Claude response"""
+        return response_body['content'][0]['text']
     
-    async def _store_pending_action(self, session_id: str, action: Dict[str, Any]):
+    @staticmethod
+    def _parse_body_nova(response_body: Dict[str, Any]) -> str:
+        """Extract the completion text from an Amazon Nova response"""
+        return response_body['output']['message']['content'][0]['text']
+    
+    @staticmethod
+    def _parse_stream_chunk_anthropic(payload: Dict[str, Any]) -> Optional[str]:
+        """Extract delta text from an Anthropic Claude stream chunk"""
+        if payload.get('type') != 'content_block_delta':
+            return None
+        return payload['delta'].get('text')
+    
+    @staticmethod
+    def _parse_stream_chunk_nova(payload: Dict[str, Any]) -> Optional[str]:
+        """Extract delta text from an Amazon Nova stream chunk"""
+        return payload.get('contentBlockDelta', {}).get('delta', {}).get('text')
+    
+    @staticmethod
+    def _new_action_id(session_id: str) -> str:
+        """Create an ID for a pending action"""
+        # Random suffix keeps IDs unique even for actions created in the same instant
+        return f"{session_id}-{uuid.uuid4().hex}"
+    
+    async def _store_pending_action(
+        self,
+        session_id: str,
+        action_id: str,
+        action: Dict[str, Any]
+    ):
         """Store action pending approval in DynamoDB"""
-        dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-        table = dynamodb.Table(settings.DYNAMODB_ACTIONS_TABLE)
-        
-        table.put_item(
+        await self._actions_table.put_item(
             Item={
                 'session_id': session_id,
-                'action_id': f"{session_id}-{datetime.utcnow().timestamp()}",
-                'action': json.dumps(action),
+                'action_id': action_id,
+                'action': orjson.dumps(action).decode(),
                 'status': 'pending',
-                'created_at': datetime.utcnow().isoformat()
+                'created_at': datetime.now(timezone.utc).isoformat()
             }
         )
     
     async def approve_action(self, session_id: str, action_id: str) -> Dict[str, Any]:
         """Approve and execute a pending action"""
         # Retrieve action from DynamoDB
-        dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-        table = dynamodb.Table(settings.DYNAMODB_ACTIONS_TABLE)
-        
-        response = table.get_item(
+        response = await self._actions_table.get_item(
             Key={'session_id': session_id, 'action_id': action_id}
         )
         
         if 'Item' not in response:
             return {"error": "Action not found"}
         
-        action = json.loads(response['Item']['action'])
+        action = orjson.loads(response['Item']['action'])
         
         # Execute the action
         result = await self.tool_registry.execute_tool(
@@ -316,21 +742,63 @@ Response:"""
         )
         
         # Update action status
-        table.update_item(
+        await self._actions_table.update_item(
             Key={'session_id': session_id, 'action_id': action_id},
             UpdateExpression='SET #status = :status, executed_at = :executed_at',
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={
                 ':status': 'executed',
-                ':executed_at': datetime.utcnow().isoformat()
+                ':executed_at': datetime.now(timezone.utc).isoformat()
             }
         )
         
         return result
     
+    async def warm_up(self):
+        """
+        Open the agent's long-lived AWS connections before the first request
+        
+        Warms the Bedrock runtime and DynamoDB clients that requests reuse,
+        concurrently. The Bedrock check is a billed one-token request.
+        Failures are logged and otherwise ignored; the agent still works
+        without warm-up.
+        """
+        checks = {
+            "bedrock": self._warm_up_bedrock(),
+            "dynamodb": self._actions_table.load()
+        }
+        outcomes = await asyncio.gather(*checks.values(), return_exceptions=True)
+        
+        for name, outcome in zip(checks, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning("Warm-up of %s failed: %s", name, outcome)
+        
+        logger.info("Agent warm-up completed")
+    
+    async def _warm_up_bedrock(self):
+        """Open the Bedrock runtime connection with a one-token request"""
+        request_body = self._build_body("Hi")
+        if self._is_anthropic:
+            request_body['max_tokens'] = 1
+        else:
+            request_body['inferenceConfig']['maxTokens'] = 1
+        
+        response = await self.bedrock_runtime.invoke_model(
+            modelId=settings.BEDROCK_MODEL_ID,
+            body=orjson.dumps(request_body),
+            **self._invoke_kwargs()
+        )
+        await response['body'].read()
+    
     async def cleanup(self):
         """Cleanup resources"""
         logger.info("Cleaning up agent resources...")
         if self.tool_registry:
             await self.tool_registry.cleanup()
+        if self.bedrock_batcher:
+            await self.bedrock_batcher.stop()
+        if self._exit_stack:
+            # Close the aioboto3 clients entered in initialize()
+            await self._exit_stack.aclose()
+            self._exit_stack = None
 
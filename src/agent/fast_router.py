@@ -0,0 +1,85 @@
+"""
+Deterministic router for trivial requests
+Maps unambiguous queries straight to a single tool call, skipping the LLM
+"""
+import re
+from typing import Any, Collection, Dict, Optional
+
+# Patterns are anchored so compound requests ("... and their costs")
+# still reach Bedrock for a full plan
+_LEAD_IN = r"^\s*(?:please\s+)?(?:(?:can|could)\s+you\s+)?"
+_TRAILER = r"\s*[.?!]*\s*$"
+
+# (pattern, tool, tool input builder, rationale builder)
+_ROUTES = (
+    # "list my EC2 instances"
+    (
+        re.compile(
+            _LEAD_IN
+            + r"(?:list|show|get)\s+(?:me\s+)?(?:all\s+)?(?:my\s+|the\s+|our\s+)?"
+            r"(?P<service>ec2|lambda|s3)"
+            r"(?:\s+(?:instances?|functions?|buckets?))?"
+            + _TRAILER,
+            re.IGNORECASE
+        ),
+        "aws_infrastructure",
+        lambda match: {"action": "list", "service": match.group('service').lower()},
+        lambda tool_input: f"List {tool_input['service']} resources"
+    ),
+    # "show my AWS costs for last week"
+    (
+        re.compile(
+            _LEAD_IN
+            + r"(?:show|get|what\s+(?:is|are|was|were))\s+(?:me\s+)?(?:my\s+|the\s+|our\s+)?"
+            r"(?:aws\s+)?(?:costs?|spend(?:ing)?|bill)"
+            r"(?:\s+(?:for\s+)?(?P<period>last\s+month|last\s+week|today))?"
+            + _TRAILER,
+            re.IGNORECASE
+        ),
+        "cost_analysis",
+        lambda match: {"time_period": "_".join((match.group('period') or "last month").lower().split())},
+        lambda tool_input: f"Get cost data for {tool_input['time_period']}"
+    ),
+)
+
+
+def try_route(
+    query: str,
+    available_tools: Optional[Collection[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Return a ready-made reasoning result for a trivial query, if it is one
+    
+    Args:
+        query: User request
+        available_tools: Names of registered tools; routes to any other
+            tool are skipped. None allows every route.
+    
+    Returns:
+        Dict shaped like ReasoningEngine.reason() output, or None when the
+        query needs the LLM
+    """
+    for pattern, tool, build_input, build_rationale in _ROUTES:
+        match = pattern.match(query)
+        if not match:
+            continue
+        if available_tools is not None and tool not in available_tools:
+            return None
+        
+        tool_input = build_input(match)
+        return {
+            "reasoning": f"Direct tool dispatch to {tool} ({', '.join(map(str, tool_input.values()))}).",
+            "plan": [
+                {
+                    "step": 1,
+                    "tool": tool,
+                    "input": tool_input,
+                    "rationale": build_rationale(tool_input),
+                    # Routed tools are read-only
+                    "requires_approval": False
+                }
+            ],
+            "user_facing_summary": ""
+        }
+    
+    return None
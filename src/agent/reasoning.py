@@ -4,108 +4,34 @@ Uses AWS Bedrock LLM for complex reasoning and planning
 """
 import json
 import logging
-from typing import Dict, Any, List, Optional
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple, AsyncIterator
+import orjson
+
+from src.agent.fast_router import try_route
 
 logger = logging.getLogger(__name__)
 
+# Number of most recent messages included in the reasoning prompt
+HISTORY_WINDOW = 5
 
-class ReasoningEngine:
-    """
-    Autonomous reasoning engine that analyzes requests,
-    plans actions, and makes decisions
-    """
-    
-    def __init__(self, bedrock_client, model_id: str):
-        self.bedrock_client = bedrock_client
-        self.model_id = model_id
-    
-    async def reason(
-        self,
-        query: str,
-        history: List[Dict[str, Any]],
-        available_tools: List[Dict[str, Any]],
-        context: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """
-        Reason about the query and create an action plan
-        
-        Returns:
-            reasoning: Explanation of the reasoning process
-            plan: List of actions to take
-        """
-        
-        # Build reasoning prompt
-        prompt = self._build_reasoning_prompt(
-            query=query,
-            history=history,
-            available_tools=available_tools,
-            context=context
-        )
-        
-        try:
-            # Prepare request body based on model type
-            if "anthropic" in self.model_id.lower():
-                # Anthropic Claude format
-                request_body = {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 4000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.3,
-                    "system": self._get_system_prompt()
-                }
-            else:
-                # Amazon Nova or other models format
-                request_body = {
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [{"text": prompt}]
-                        }
-                    ],
-                    "inferenceConfig": {
-                        "maxTokens": 4000,
-                        "temperature": 0.3
-                    },
-                    "system": [{"text": self._get_system_prompt()}]
-                }
-            
-            # Call Bedrock for reasoning
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body)
-            )
-            
-            response_body = json.loads(response['body'].read())
-            
-            # Parse response based on model type
-            if "anthropic" in self.model_id.lower():
-                reasoning_text = response_body['content'][0]['text']
-            else:
-                # Amazon Nova format
-                reasoning_text = response_body['output']['message']['content'][0]['text']
-            
-            # Parse the reasoning output
-            parsed_result = self._parse_reasoning_output(reasoning_text)
-            
-            logger.info(f"Reasoning completed: {parsed_result['reasoning']}")
-            
-            return parsed_result
-            
-        except Exception as e:
-            logger.error(f"Error during reasoning: {e}", exc_info=True)
-            return {
-                "reasoning": "Unable to complete reasoning due to an error",
-                "plan": []
-            }
-    
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for the reasoning agent"""
-        return """You are an expert DevOps Intelligence Agent with deep knowledge of:
+# Fenced ```json block holding the reasoning object
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+# Opening brace of an object that starts with a key
+_JSON_OBJECT_START_RE = re.compile(r'\{\s*"')
+
+# Start of the "reasoning" string value in the model's JSON output
+_REASONING_FIELD_RE = re.compile(r'"reasoning"\s*:\s*"')
+# Start of the first object in the "plan" array
+_PLAN_ARRAY_RE = re.compile(r'"plan"\s*:\s*\[\s*(?=\{)')
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+# Output kept between chunks while looking for the "reasoning" or "plan" key
+_FIELD_LOOKBACK = 64
+
+# Static system prompt shared by every reasoning request
+_SYSTEM_PROMPT = """You are an expert DevOps Intelligence Agent with deep knowledge of:
 - Cloud infrastructure (AWS, Azure, GCP)
 - CI/CD pipelines and deployment strategies
 - Code analysis and security best practices
@@ -127,29 +53,9 @@ Your role is to:
 5. Consider security, cost, and performance implications
 
 Always think step-by-step and ALWAYS use tools when available."""
-    
-    def _build_reasoning_prompt(
-        self,
-        query: str,
-        history: List[Dict[str, Any]],
-        available_tools: List[Dict[str, Any]],
-        context: Optional[Dict[str, Any]]
-    ) -> str:
-        """Build the reasoning prompt"""
-        
-        tools_description = "\n".join([
-            f"- {tool['name']}: {tool['description']}"
-            for tool in available_tools
-        ])
-        
-        history_text = "\n".join([
-            f"{msg['role']}: {msg['content']}"
-            for msg in history[-5:]  # Last 5 messages for context
-        ]) if history else "No previous conversation"
-        
-        context_text = json.dumps(context, indent=2) if context else "No additional context"
-        
-        return f"""Analyze the following user request and create a detailed action plan.
+
+# Per-request part of the reasoning prompt
+_REQUEST_SECTION_TMPL = """Analyze the following user request and create a detailed action plan.
 
 User Request: {query}
 
@@ -157,9 +63,11 @@ Conversation History:
 {history_text}
 
 Additional Context:
-{context_text}
+{context_text}"""
 
-Available Tools:
+# Part of the reasoning prompt that only changes with the tool set; sent
+# as a separate, cacheable content block when prompt caching is enabled
+_TOOLS_SECTION_TMPL = """Available Tools:
 {tools_description}
 
 IMPORTANT: You must respond with a JSON object containing your reasoning and a plan with tool calls.
@@ -217,9 +125,11 @@ Your response format:
             "tool": "tool_name",
             "input": {{"param": "value"}},
             "rationale": "Why this step is needed",
-            "requires_approval": false
+            "requires_approval": false,
+            "depends_on": []
         }}
-    ]
+    ],
+    "user_facing_summary": "Only when the plan is empty: your complete answer to the user"
 }}
 
 CRITICAL RULES:
@@ -229,37 +139,745 @@ CRITICAL RULES:
 4. ONLY valid services: "ec2", "lambda", "s3"
 5. For costs: use cost_analysis tool
 6. For code: use code_analysis tool
+7. If no tool is needed (e.g. greetings or general questions), return an empty plan and answer in user_facing_summary
+8. Set depends_on to the step numbers whose results a step needs; leave it empty for independent steps (e.g. listing EC2, Lambda and S3) so they run in parallel
 
 REMEMBER: action must ALWAYS be exactly "list" for aws_infrastructure tool!"""
+
+# Changes whenever either prompt changes; keys cached reasoning results
+PROMPT_FINGERPRINT = _SYSTEM_PROMPT + _REQUEST_SECTION_TMPL + _TOOLS_SECTION_TMPL
+
+# Query entities that vary between otherwise identical requests, with a
+# normalizer mapping the query wording to the value tools expect
+_PLAN_ENTITY_PATTERNS = (
+    ("service", re.compile(r"\b(ec2|lambda|s3)\b", re.IGNORECASE),
+     lambda value: value.lower()),
+    ("time_period", re.compile(r"\b(last[\s_]+month|last[\s_]+week|today)\b", re.IGNORECASE),
+     lambda value: "_".join(value.lower().replace("_", " ").split())),
+    ("region", re.compile(r"\b([a-z]{2}(?:-gov)?-[a-z]+-\d)\b", re.IGNORECASE),
+     lambda value: value.lower()),
+)
+
+
+class PlanCache:
+    """
+    Cache of plan templates for recurring request intents
     
-    def _parse_reasoning_output(self, reasoning_text: str) -> Dict[str, Any]:
-        """Parse the LLM reasoning output"""
+    A query's intent is its normalized text with known entities (service,
+    time period, region) replaced by placeholders, so "list ec2 instances"
+    and "list lambda instances" share one template. Templates are evicted
+    least recently used, and the agent invalidates an intent whose cached
+    plan fails during execution.
+    
+    Entity mentions are parameterized in every string of the plan,
+    including free text such as rationales and search queries. Plans that
+    name another value of the same entity type, or that contain
+    approval-gated steps, are not stored.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._templates: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return a plan for the query built from a cached template, if any"""
+        intent, entities = self.classify(query)
+        template = self._templates.get(intent) if intent else None
+        if template is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._templates.move_to_end(intent)
+        return {
+            "reasoning": f"Reused cached plan for intent '{intent}'.",
+            "plan": self._substitute(template, lambda text: self._fill(text, entities)),
+            "user_facing_summary": "",
+            "plan_intent": intent
+        }
+    
+    def put(self, query: str, result: Dict[str, Any]):
+        """Store the result's plan as a template for the query's intent"""
+        intent, entities = self.classify(query)
+        if not intent or not result.get('plan'):
+            return
+        if any(step.get('requires_approval') for step in result['plan']):
+            return
+        
+        template = self._substitute(result['plan'], lambda text: self._parameterize(text, entities))
+        # Any other value of the same entity would be replayed verbatim
+        for name, pattern, _ in _PLAN_ENTITY_PATTERNS:
+            if name in entities and self._mentions(template, pattern):
+                return
+        
+        self._templates[intent] = template
+        self._templates.move_to_end(intent)
+        result['plan_intent'] = intent
+        
+        while len(self._templates) > self.max_entries:
+            self._templates.popitem(last=False)
+    
+    def invalidate(self, intent: str):
+        """Drop the template for an intent, e.g. after its plan failed"""
+        if self._templates.pop(intent, None) is not None:
+            logger.info("Invalidated cached plan for intent: %s", intent)
+    
+    @staticmethod
+    def classify(query: str) -> Tuple[Optional[str], Dict[str, str]]:
+        """
+        Split a query into its intent key and entity values
+        
+        Returns (None, {}) when an entity type appears with more than
+        one value, since a single template can't cover that query.
+        """
+        intent = " ".join(query.lower().split()).rstrip(".?! ")
+        entities: Dict[str, str] = {}
+        
+        for name, pattern, normalize in _PLAN_ENTITY_PATTERNS:
+            values = {normalize(value) for value in pattern.findall(intent)}
+            if len(values) > 1:
+                return None, {}
+            if values:
+                entities[name] = values.pop()
+                intent = pattern.sub(f"<{name}>", intent)
+        
+        return intent, entities
+    
+    @classmethod
+    def _mentions(cls, value: Any, pattern: re.Pattern) -> bool:
+        """Whether any string leaf of value contains a match of pattern"""
+        if isinstance(value, dict):
+            return any(cls._mentions(item, pattern) for item in value.values())
+        if isinstance(value, list):
+            return any(cls._mentions(item, pattern) for item in value)
+        if isinstance(value, str):
+            return pattern.search(value) is not None
+        return False
+    
+    @staticmethod
+    def _parameterize(text: str, entities: Dict[str, str]) -> str:
+        """Replace mentions of the query's entity values with placeholders"""
+        for name, pattern, normalize in _PLAN_ENTITY_PATTERNS:
+            value = entities.get(name)
+            if value is not None:
+                text = pattern.sub(
+                    lambda match: f"<{name}>" if normalize(match.group(0)) == value else match.group(0),
+                    text
+                )
+        return text
+    
+    @staticmethod
+    def _fill(text: str, entities: Dict[str, str]) -> str:
+        """Replace placeholders with the query's entity values"""
+        for name, value in entities.items():
+            text = text.replace(f"<{name}>", value)
+        return text
+    
+    @classmethod
+    def _substitute(cls, value: Any, replace: Callable[[str], str]) -> Any:
+        """Copy value, passing every string leaf through replace"""
+        if isinstance(value, dict):
+            return {key: cls._substitute(item, replace) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._substitute(item, replace) for item in value]
+        if isinstance(value, str):
+            return replace(value)
+        return value
+
+
+class _ReasoningFieldStream:
+    """
+    Accumulates streamed model output and decodes the "reasoning" string
+    value as it arrives, so it can be shown before the JSON is complete
+    
+    Only the undecoded tail of the output is kept for scanning, so each
+    chunk is processed once and the total cost stays linear in the output.
+    """
+    
+    def __init__(self):
+        self.done = False
+        self._chunks: List[str] = []
+        # Output not yet consumed: a lookback while searching for the
+        # field, a split escape while decoding, the text after the value
+        # until the first plan step is complete
+        self._pending = ""
+        self._in_value = False
+        # Offset of the first plan object in _pending, once seen
+        self._step_start: Optional[int] = None
+        self._first_step: Optional[Dict[str, Any]] = None
+    
+    @property
+    def text(self) -> str:
+        """All output fed so far"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of output and return newly decoded reasoning text"""
+        self._chunks.append(chunk)
+        if self.done:
+            if self._first_step is None:
+                self._pending += chunk
+            return ""
+        
+        text = self._pending + chunk
+        if not self._in_value:
+            match = _REASONING_FIELD_RE.search(text)
+            if not match:
+                # Keep enough for a field name split across chunks
+                self._pending = text[-_FIELD_LOOKBACK:]
+                return ""
+            self._in_value = True
+            text = text[match.end():]
+        
+        pos, decoded = 0, []
+        while pos < len(text):
+            char = text[pos]
+            if char == '"':
+                self.done = True
+                break
+            if char == '\\':
+                # Wait for the rest of an escape split across chunks
+                if pos + 1 >= len(text):
+                    break
+                escape = text[pos + 1]
+                if escape == 'u':
+                    if pos + 6 > len(text):
+                        break
+                    code = self._hex_code(text[pos + 2:pos + 6])
+                    if code is not None and 0xD800 <= code <= 0xDBFF:
+                        # A high surrogate is only emitted together with its low half
+                        follow = text[pos + 6:pos + 12]
+                        if len(follow) < 6 and "\\u".startswith(follow[:2]):
+                            break
+                        low = self._hex_code(follow[2:]) if follow[:2] == "\\u" else None
+                        if low is not None and 0xDC00 <= low <= 0xDFFF:
+                            decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + low - 0xDC00))
+                            pos += 12
+                            continue
+                        code = None
+                    elif code is not None and 0xDC00 <= code <= 0xDFFF:
+                        code = None
+                    # Lone surrogates can't be encoded as UTF-8 and malformed
+                    # escapes can't be decoded, so both become U+FFFD
+                    decoded.append(chr(0xFFFD if code is None else code))
+                    pos += 6
+                else:
+                    decoded.append(_JSON_ESCAPES.get(escape, escape))
+                    pos += 2
+                continue
+            
+            # Copy the plain run up to the next quote or escape in one go
+            end = len(text)
+            for special in ('"', '\\'):
+                index = text.find(special, pos)
+                if index != -1:
+                    end = min(end, index)
+            decoded.append(text[pos:end])
+            pos = end
+        
+        # After the closing quote this is the text that may hold the plan
+        self._pending = text[pos:]
+        return "".join(decoded)
+    
+    def first_plan_step(self) -> Optional[Dict[str, Any]]:
+        """Return the first plan step once the model has finished writing it"""
+        if self._first_step is not None or not self.done:
+            return self._first_step
+        
+        # Only text after the reasoning value is kept, so text inside it can't match
+        if self._step_start is None:
+            match = _PLAN_ARRAY_RE.search(self._pending)
+            if not match:
+                self._pending = self._pending[-_FIELD_LOOKBACK:]
+                return None
+            self._step_start = match.end()
+        
+        try:
+            step, _ = _JSON_DECODER.raw_decode(self._pending, self._step_start)
+        except ValueError:
+            # Still incomplete
+            return None
+        if not isinstance(step, dict):
+            return None
+        
+        self._first_step, self._pending = step, ""
+        return step
+    
+    @staticmethod
+    def _hex_code(digits: str) -> Optional[int]:
+        """Code point of a \\u escape's four hex digits; None if malformed"""
+        # int() would also accept signs, underscores and spaces
+        if not (digits.isascii() and digits.isalnum()):
+            return None
+        try:
+            return int(digits, 16)
+        except ValueError:
+            return None
+
+
+class ReasoningEngine:
+    """
+    Autonomous reasoning engine that analyzes requests,
+    plans actions, and makes decisions
+    """
+    
+    def __init__(
+        self,
+        bedrock_client,
+        model_id: str,
+        latency_optimized: bool = False,
+        prompt_cache: bool = False,
+        batcher=None,
+        answer_cache=None,
+        plan_cache: Optional[PlanCache] = None
+    ):
+        self.bedrock_client = bedrock_client
+        # Optional BedrockBatcher; invoke_model calls go through it when set
+        self.batcher = batcher
+        # Optional AnswerCache reused for paraphrased queries
+        self.answer_cache = answer_cache
+        # Optional PlanCache of templates for recurring intents
+        self.plan_cache = plan_cache
+        self.model_id = model_id
+        self.latency_optimized = latency_optimized
+        self.prompt_cache = prompt_cache
+        
+        # Model family is fixed for the engine's lifetime, so pick the
+        # request/response format once instead of on every call
+        self._is_anthropic = "anthropic" in model_id.lower()
+        if self._is_anthropic:
+            self._build_body = self._build_body_anthropic
+            self._parse_body = self._parse_body_anthropic
+            self._parse_stream_chunk = self._parse_stream_chunk_anthropic
+        else:
+            self._build_body = self._build_body_nova
+            self._parse_body = self._parse_body_nova
+            self._parse_stream_chunk = self._parse_stream_chunk_nova
+        
+        # Everything except the messages is identical on every request
+        self._body_template = self._build_body_template()
+        # (tool definitions list, rendered description) from the last prompt
+        self._tools_description_cache = (None, "")
+        # (tool definitions list, rendered tools section) from the last prompt
+        self._tools_section_cache = (None, "")
+    
+    async def reason(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Reason about the query and create an action plan
+        
+        Returns:
+            reasoning: Explanation of the reasoning process
+            plan: List of actions to take
+            user_facing_summary: Direct answer when the plan is empty
+        """
+        
+        known_plan = await self._lookup_plan(query, history, available_tools, context)
+        if known_plan:
+            return known_plan
+        
+        # Build reasoning prompt
+        request_body = self._build_reasoning_request(
+            query=query,
+            history=history,
+            available_tools=available_tools,
+            context=context
+        )
+        
         try:
-            # Try to extract JSON from the response
-            # LLM might wrap JSON in markdown code blocks
-            if "```json" in reasoning_text:
-                json_start = reasoning_text.find("```json") + 7
-                json_end = reasoning_text.find("```", json_start)
-                json_text = reasoning_text[json_start:json_end].strip()
-            elif "```" in reasoning_text:
-                json_start = reasoning_text.find("```") + 3
-                json_end = reasoning_text.find("```", json_start)
-                json_text = reasoning_text[json_start:json_end].strip()
+            invoke_model = (self.batcher or self.bedrock_client).invoke_model
+            
+            # Call Bedrock for reasoning
+            response = await invoke_model(
+                modelId=self.model_id,
+                body=orjson.dumps(request_body),
+                **self._invoke_kwargs()
+            )
+            
+            response_body = orjson.loads(await response['body'].read())
+            
+            reasoning_text = self._parse_body(response_body)
+            
+            # Parse the reasoning output
+            parsed_result = self._parse_reasoning_output(reasoning_text)
+            
+            logger.info("Reasoning completed: %s", parsed_result['reasoning'])
+            
+            self._remember_plan(query, history, available_tools, context, parsed_result)
+            
+            return parsed_result
+            
+        except Exception as e:
+            logger.exception("Error during reasoning: %s", e)
+            return self._error_result()
+    
+    async def reason_stream(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Reason about the query, streaming the reasoning as it is generated
+        
+        Yields {"type": "reasoning_delta", "text": ...} events while the
+        model writes its reasoning, a {"type": "plan_step", "step": ...}
+        event as soon as the first plan step is complete, then a single
+        {"type": "result", "result": ...} event with the same payload as
+        reason(). Direct and cached plans produce only the result event.
+        """
+        known_plan = await self._lookup_plan(query, history, available_tools, context)
+        if known_plan:
+            yield {"type": "result", "result": known_plan}
+            return
+        
+        request_body = self._build_reasoning_request(
+            query=query,
+            history=history,
+            available_tools=available_tools,
+            context=context
+        )
+        
+        try:
+            # Streaming calls bypass the batcher, which only handles invoke_model
+            response = await self.bedrock_client.invoke_model_with_response_stream(
+                modelId=self.model_id,
+                body=orjson.dumps(request_body),
+                **self._invoke_kwargs()
+            )
+            
+            output = _ReasoningFieldStream()
+            first_step_sent = False
+            async for event in response['body']:
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+                text = self._parse_stream_chunk(orjson.loads(chunk['bytes']))
+                if not text:
+                    continue
+                delta = output.feed(text)
+                if delta:
+                    yield {"type": "reasoning_delta", "text": delta}
+                
+                if not first_step_sent:
+                    first_step = output.first_plan_step()
+                    if first_step:
+                        first_step_sent = True
+                        yield {"type": "plan_step", "step": first_step}
+            
+            parsed_result = self._parse_reasoning_output(output.text)
+            
+            logger.info("Reasoning completed: %s", parsed_result['reasoning'])
+            
+            self._remember_plan(query, history, available_tools, context, parsed_result)
+            
+        except Exception as e:
+            logger.exception("Error during streamed reasoning: %s", e)
+            parsed_result = self._error_result()
+        
+        yield {"type": "result", "result": parsed_result}
+    
+    async def _lookup_plan(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Return a plan without calling the model, if one is known for the query"""
+        direct_plan = try_route(query, {tool['name'] for tool in available_tools})
+        if direct_plan:
+            logger.info("Direct tool dispatch for query: %s", query)
+            return direct_plan
+        
+        # Request-specific context and earlier turns can change the plan, so
+        # they bypass the caches: follow-ups ("yes", "same for us-west-2")
+        # only make sense within their own conversation
+        if context or history:
+            return None
+        
+        if self.plan_cache is not None:
+            cached_plan = self.plan_cache.get(query)
+            if cached_plan:
+                logger.info("Plan cache hit for query: %s", query)
+                return cached_plan
+        
+        if self.answer_cache is not None:
+            return await self.answer_cache.get(query, available_tools)
+        
+        return None
+    
+    def _remember_plan(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]],
+        result: Dict[str, Any]
+    ):
+        """Store a freshly reasoned result in the enabled caches"""
+        if context or history:
+            return
+        
+        if self.plan_cache is not None:
+            self.plan_cache.put(query, result)
+        
+        if self.answer_cache is not None and (result['plan'] or result.get('user_facing_summary')):
+            self.answer_cache.put(query, available_tools, result)
+    
+    def _invoke_kwargs(self) -> Dict[str, Any]:
+        """Extra invoke_model arguments for the configured performance mode"""
+        if self.latency_optimized:
+            return {'performanceConfigLatency': 'optimized'}
+        return {}
+    
+    @staticmethod
+    def _error_result() -> Dict[str, Any]:
+        """Result returned when reasoning fails"""
+        return {
+            "reasoning": "Unable to complete reasoning due to an error",
+            "plan": []
+        }
+    
+    def _build_body_template(self) -> Dict[str, Any]:
+        """
+        Build the static part of the request body once
+        
+        With prompt caching enabled the system prompt is marked as a
+        cache checkpoint so Bedrock can reuse it across requests.
+        """
+        system_prompt = self._get_system_prompt()
+        
+        if self._is_anthropic:
+            # Anthropic Claude format
+            if self.prompt_cache:
+                system = [{
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }]
             else:
-                # Try to find JSON object in the text
-                json_start = reasoning_text.find("{")
-                json_end = reasoning_text.rfind("}") + 1
-                json_text = reasoning_text[json_start:json_end]
+                system = system_prompt
             
-            parsed = json.loads(json_text)
+            return {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 4000,
+                "temperature": 0.3,
+                "system": system
+            }
+        
+        # Amazon Nova or other models format
+        system = [{"text": system_prompt}]
+        if self.prompt_cache:
+            system.append({"cachePoint": {"type": "default"}})
+        
+        return {
+            "inferenceConfig": {
+                "maxTokens": 4000,
+                "temperature": 0.3
+            },
+            "system": system
+        }
+    
+    def _build_body_anthropic(self, prompt: str, cached_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the request body in Anthropic Claude format
+        
+        A cached_prefix is sent as its own content block ahead of the
+        prompt, marked as a cache checkpoint.
+        """
+        content = prompt
+        if cached_prefix:
+            content = [
+                {"type": "text", "text": cached_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+        
+        return {
+            **self._body_template,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ]
+        }
+    
+    def _build_body_nova(self, prompt: str, cached_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the request body in Amazon Nova (and other models) format
+        
+        A cached_prefix is sent ahead of the prompt, followed by a cache point.
+        """
+        content = [{"text": prompt}]
+        if cached_prefix:
+            content = [{"text": cached_prefix}, {"cachePoint": {"type": "default"}}, *content]
+        
+        return {
+            **self._body_template,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ]
+        }
+    
+    @staticmethod
+    def _parse_body_anthropic(response_body: Dict[str, Any]) -> str:
+        """Extract the completion text from an Anthropic Claude response"""
+        return response_body['content'][0]['text']
+    
+    @staticmethod
+    def _parse_body_nova(response_body: Dict[str, Any]) -> str:
+        """Extract the completion text from an Amazon Nova response"""
+        return response_body['output']['message']['content'][0]['text']
+    
+    @staticmethod
+    def _parse_stream_chunk_anthropic(payload: Dict[str, Any]) -> Optional[str]:
+        """Extract delta text from an Anthropic Claude stream chunk"""
+        if payload.get('type') != 'content_block_delta':
+            return None
+        return payload['delta'].get('text')
+    
+    @staticmethod
+    def _parse_stream_chunk_nova(payload: Dict[str, Any]) -> Optional[str]:
+        """Extract delta text from an Amazon Nova stream chunk"""
+        return payload.get('contentBlockDelta', {}).get('delta', {}).get('text')
+    
+    def _get_system_prompt(self) -> str:
+        """Get the system prompt for the reasoning agent"""
+        return _SYSTEM_PROMPT
+    
+    def _format_tools(self, available_tools: List[Dict[str, Any]]) -> str:
+        """Render the tool list, reusing the last rendering for the same list"""
+        cached_tools, cached_text = self._tools_description_cache
+        if cached_tools is not available_tools:
+            cached_text = "\n".join([
+                f"- {tool['name']}: {tool['description']}"
+                for tool in available_tools
+            ])
+            self._tools_description_cache = (available_tools, cached_text)
+        return cached_text
+    
+    def _format_tools_section(self, available_tools: List[Dict[str, Any]]) -> str:
+        """Render the tools, examples and rules part of the prompt for a tool list"""
+        cached_tools, cached_text = self._tools_section_cache
+        if cached_tools is not available_tools:
+            cached_text = _TOOLS_SECTION_TMPL.format_map({
+                "tools_description": self._format_tools(available_tools)
+            })
+            self._tools_section_cache = (available_tools, cached_text)
+        return cached_text
+    
+    def _format_history(self, history: List[Dict[str, Any]]) -> str:
+        """Render the most recent messages"""
+        if not history:
+            return "No previous conversation"
+        
+        window = history[-HISTORY_WINDOW:]  # Most recent messages for context
+        return "\n".join([f"{msg['role']}: {msg['content']}" for msg in window])
+    
+    def _build_reasoning_request(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the reasoning request body"""
+        request_text = self._build_request_section(query, history, context)
+        tools_text = self._format_tools_section(available_tools)
+        
+        if self.prompt_cache:
+            # Static section first so Bedrock can reuse it as a cached prefix
+            return self._build_body(request_text, cached_prefix=tools_text)
+        
+        return self._build_body(f"{request_text}\n\n{tools_text}")
+    
+    def _build_reasoning_prompt(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        available_tools: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]]
+    ) -> str:
+        """Build the reasoning prompt"""
+        request_text = self._build_request_section(query, history, context)
+        return f"{request_text}\n\n{self._format_tools_section(available_tools)}"
+    
+    def _build_request_section(
+        self,
+        query: str,
+        history: List[Dict[str, Any]],
+        context: Optional[Dict[str, Any]]
+    ) -> str:
+        """Build the per-request part of the reasoning prompt"""
+        history_text = self._format_history(history)
+        
+        context_text = orjson.dumps(context, option=orjson.OPT_INDENT_2).decode() if context else "No additional context"
+        
+        return _REQUEST_SECTION_TMPL.format_map({
+            "query": query,
+            "history_text": history_text,
+            "context_text": context_text
+        })
+    
+    @staticmethod
+    def _extract_json_object(text: str) -> Dict[str, Any]:
+        """Return the first JSON object in the text, preferring a fenced block"""
+        # LLM might wrap JSON in markdown code blocks
+        match = _JSON_FENCE_RE.search(text)
+        if match:
+            try:
+                return orjson.loads(match.group(1))
+            except orjson.JSONDecodeError:
+                pass
+        
+        # Decode the first complete JSON object, ignoring anything after it.
+        # If a "{" in leading prose gets in the way, retry once from the
+        # next brace that opens an object with a key
+        starts = []
+        start = text.find("{")
+        if start != -1:
+            starts.append(start)
+            retry = _JSON_OBJECT_START_RE.search(text, start + 1)
+            if retry:
+                starts.append(retry.start())
+        
+        for start in starts:
+            try:
+                parsed, _ = _JSON_DECODER.raw_decode(text, start)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+        
+        raise ValueError("No JSON object found in reasoning output")
+    
+    def _parse_reasoning_output(self, reasoning_text: str) -> Dict[str, Any]:
+        """Parse the LLM reasoning output"""
+        try:
+            parsed = self._extract_json_object(reasoning_text)
             
             return {
                 "reasoning": parsed.get("reasoning", ""),
-                "plan": parsed.get("plan", [])
+                "plan": parsed.get("plan", []),
+                "user_facing_summary": parsed.get("user_facing_summary", "")
             }
             
         except Exception as e:
-            logger.error(f"Error parsing reasoning output: {e}")
+            logger.error("Error parsing reasoning output: %s", e)
             # Fallback: return the raw text as reasoning
             return {
                 "reasoning": reasoning_text,
@@ -0,0 +1,184 @@
+"""
+Semantic cache for reasoning results
+Reuses plans for paraphrased queries using Bedrock Titan embeddings
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Titan v2 supports 256/512/1024; 256 keeps the similarity scan cheap
+_EMBEDDING_DIMENSIONS = 256
+
+
+class AnswerCache:
+    """
+    In-memory cache of reasoning results keyed by query embedding
+    
+    A lookup hits when a stored query with the same tool set and prompt
+    has cosine similarity of at least `threshold`. Entries expire after
+    `ttl_seconds` and the least recently used entry is evicted once
+    `max_entries` is reached.
+    
+    Results are stored as JSON bytes, so every hit returns a fresh copy
+    that callers may mutate freely.
+    """
+    
+    def __init__(
+        self,
+        client,
+        embedding_model_id: str,
+        prompt_fingerprint: str = "",
+        threshold: float = 0.92,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600
+    ):
+        # Anything with an async invoke_model (Bedrock client or BedrockBatcher)
+        self.client = client
+        self.embedding_model_id = embedding_model_id
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Plans written against a different prompt must not be reused
+        self._prompt_hash = hashlib.sha1(prompt_fingerprint.encode()).hexdigest()
+        
+        # entry id -> (key, unit vector, serialized result, expires_at)
+        self._entries: "OrderedDict[int, Tuple[str, List[float], bytes, float]]" = OrderedDict()
+        self._next_id = 0
+        # Embeddings of recent lookups so put() doesn't embed the same query twice
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Background embed-and-store tasks started by put()
+        self._pending: Set[asyncio.Task] = set()
+    
+    async def get(
+        self,
+        query: str,
+        available_tools: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a similar query, if any"""
+        vector = await self._embed(query)
+        if vector is None:
+            return None
+        
+        key = self._key(available_tools)
+        now = time.monotonic()
+        candidates = []
+        
+        for entry_id, (entry_key, entry_vector, _, expires_at) in list(self._entries.items()):
+            if expires_at <= now:
+                del self._entries[entry_id]
+            elif entry_key == key:
+                candidates.append((entry_id, entry_vector))
+        
+        if not candidates:
+            return None
+        
+        # The similarity scan is pure-Python arithmetic; keep it off the event loop
+        best_id, best_score = await asyncio.to_thread(self._best_match, vector, candidates, self.threshold)
+        entry = self._entries.get(best_id) if best_id is not None else None
+        if entry is None:
+            return None
+        
+        self._entries.move_to_end(best_id)
+        logger.info("Semantic cache hit (similarity %.3f)", best_score)
+        return orjson.loads(entry[2])
+    
+    def put(
+        self,
+        query: str,
+        available_tools: List[Dict[str, Any]],
+        result: Dict[str, Any]
+    ):
+        """
+        Store a reasoning result for the query
+        
+        The result is copied immediately. The query's embedding is reused
+        from the get() that preceded it; if there is none, it is computed
+        in a background task so the caller never waits on it.
+        """
+        key, payload = self._key(available_tools), orjson.dumps(result)
+        
+        vector = self._embeddings.get(self._normalize(query))
+        if vector is not None:
+            self._store(key, vector, payload)
+            return
+        
+        task = asyncio.create_task(self._embed_and_store(query, key, payload))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _embed_and_store(self, query: str, key: str, payload: bytes):
+        """Embed the query, then store the serialized result under it"""
+        vector = await self._embed(query)
+        if vector is not None:
+            self._store(key, vector, payload)
+    
+    def _store(self, key: str, vector: List[float], payload: bytes):
+        """Add an entry, evicting the least recently used beyond max_entries"""
+        self._entries[self._next_id] = (key, vector, payload, time.monotonic() + self.ttl_seconds)
+        self._next_id += 1
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    @staticmethod
+    def _best_match(
+        vector: List[float],
+        candidates: List[Tuple[int, List[float]]],
+        threshold: float
+    ) -> Tuple[Optional[int], float]:
+        """Id and score of the most similar candidate at or above threshold"""
+        best_id, best_score = None, threshold
+        for entry_id, entry_vector in candidates:
+            score = sum(a * b for a, b in zip(vector, entry_vector))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+    
+    @staticmethod
+    def _normalize(query: str) -> str:
+        """Text that is embedded for a query"""
+        return " ".join(query.lower().split())
+    
+    def _key(self, available_tools: List[Dict[str, Any]]) -> str:
+        """Hash of the tool set and prompt a result was produced with"""
+        tool_names = ",".join(sorted(tool['name'] for tool in available_tools))
+        return hashlib.sha1(f"{tool_names}|{self._prompt_hash}".encode()).hexdigest()
+    
+    async def _embed(self, query: str) -> Optional[List[float]]:
+        """Embed the query as a unit vector; None if embedding fails"""
+        text = self._normalize(query)
+        
+        vector = self._embeddings.get(text)
+        if vector is not None:
+            self._embeddings.move_to_end(text)
+            return vector
+        
+        try:
+            response = await self.client.invoke_model(
+                modelId=self.embedding_model_id,
+                body=orjson.dumps({
+                    "inputText": text,
+                    "dimensions": _EMBEDDING_DIMENSIONS,
+                    "normalize": True
+                })
+            )
+            embedding = orjson.loads(await response['body'].read())['embedding']
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return None
+        
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        vector = [x / norm for x in embedding]
+        
+        self._embeddings[text] = vector
+        while len(self._embeddings) > self.max_entries:
+            self._embeddings.popitem(last=False)
+        
+        return vector
@@ -2,43 +2,111 @@
 Tool Registry and Implementations
 Tools that the agent can use to take actions
 """
+import ast
+import asyncio
+import importlib.util
 import logging
 import json
+import re
 import subprocess
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import boto3
 import httpx
 
 from src.config import settings
+from src.utils.aws import AWS_CLIENT_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# AWS services the tools call; clients are created once and shared
+_AWS_TOOL_SERVICES = ('ec2', 'lambda', 's3', 'ce')
+# HTTP/2 needs the optional h2 package (httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Regional services listed in every region of settings.AWS_REGIONS
+_AWS_REGIONAL_SERVICES = ('ec2', 'lambda')
+
+
+# Fallback for Python code that doesn't parse: the same checks as the AST walk
+_PY_ISSUE_RE = re.compile(r"\b(?P<call>eval|exec)\s*\(|\bfrom\s+[\w.]+\s+import\s+\*")
+
+_DANGEROUS_CALLS = frozenset({'eval', 'exec'})
+
+
+def _tool_regions() -> List[str]:
+    """Regions the AWS tools list resources in"""
+    return settings.AWS_REGIONS or [settings.AWS_REGION]
+
+
+def _client_key(service: str, region: Optional[str] = None) -> str:
+    """Key of a client in the shared client mapping"""
+    if region is None or region == settings.AWS_REGION:
+        return service
+    return f"{service}:{region}"
+
 
 class ToolRegistry:
     """Registry of all available tools for the agent"""
     
     def __init__(self):
         self.tools: Dict[str, 'BaseTool'] = {}
+        self._definitions: Optional[Tuple[Dict[str, Any], ...]] = None
+        self._clients: Dict[str, Any] = {}
+        self.http: Optional[httpx.AsyncClient] = None
     
     async def initialize(self):
         """Initialize all tools"""
+        # Client construction loads service models, so do it once, off the event loop
+        self._clients = await asyncio.to_thread(self._create_clients)
+        
+        # One pooled HTTP client keeps connections alive across tool calls
+        self.http = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+        
         # Register tools
-        self.register_tool(AWSInfrastructureTool())
+        self.register_tool(AWSInfrastructureTool(self._clients))
         self.register_tool(CodeAnalysisTool())
-        self.register_tool(WebSearchTool())
+        self.register_tool(WebSearchTool(http=self.http))
         self.register_tool(CodeExecutionTool())
         self.register_tool(KnowledgeBaseTool())
-        self.register_tool(CostAnalysisTool())
+        self.register_tool(CostAnalysisTool(self._clients))
         
-        logger.info(f"Registered {len(self.tools)} tools")
+        logger.info("Registered %d tools", len(self.tools))
     
     def register_tool(self, tool: 'BaseTool'):
         """Register a tool"""
         self.tools[tool.name] = tool
+        # Definitions are rebuilt on next access
+        self._definitions = None
     
-    def get_tool_definitions(self) -> List[Dict[str, Any]]:
-        """Get definitions of all tools for LLM"""
-        return [tool.get_definition() for tool in self.tools.values()]
+    def get_tool_definitions(self) -> Tuple[Dict[str, Any], ...]:
+        """
+        Get definitions of all tools for LLM
+        
+        The tuple is built once and reused until another tool is registered.
+        The definition dicts are shared, so callers must not mutate them.
+        """
+        if self._definitions is None:
+            self._definitions = tuple(tool.get_definition() for tool in self.tools.values())
+        return self._definitions
+    
+    @staticmethod
+    def _create_clients() -> Dict[str, Any]:
+        """Create the boto3 clients shared by the AWS tools"""
+        session = boto3.session.Session(region_name=settings.AWS_REGION)
+        clients = {
+            service: session.client(service, config=AWS_CLIENT_CONFIG)
+            for service in _AWS_TOOL_SERVICES
+        }
+        for region in _tool_regions():
+            for service in _AWS_REGIONAL_SERVICES:
+                key = _client_key(service, region)
+                if key not in clients:
+                    clients[key] = session.client(service, region_name=region, config=AWS_CLIENT_CONFIG)
+        return clients
     
     async def execute_tool(self, tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a specific tool"""
@@ -52,25 +120,49 @@ class ToolRegistry:
         """Cleanup all tools"""
         for tool in self.tools.values():
             await tool.cleanup()
+        
+        if self.http:
+            await self.http.aclose()
+            self.http = None
 
 
 class BaseTool:
     """Base class for all tools"""
     
+    # Subclasses declare empty __slots__ so tool instances carry no __dict__
+    __slots__ = ('clients', 'http')
+    
     name: str = "base_tool"
     description: str = "Base tool"
+    # Parameter schema; definitions are built from it once per class
+    PARAMETERS: Dict[str, Any] = {}
+    _DEFINITION: Dict[str, Any]
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._DEFINITION = {
+            "name": cls.name,
+            "description": cls.description,
+            "parameters": cls.PARAMETERS
+        }
+    
+    def __init__(
+        self,
+        clients: Optional[Dict[str, Any]] = None,
+        http: Optional[httpx.AsyncClient] = None
+    ):
+        # boto3 clients by service name, shared between tools
+        self.clients = clients if clients is not None else {}
+        # Shared HTTP client for tools that call web APIs; owned by ToolRegistry
+        self.http = http
     
     def get_definition(self) -> Dict[str, Any]:
-        """Get tool definition for LLM"""
-        return {
-            "name": self.name,
-            "description": self.description,
-            "parameters": self.get_parameters()
-        }
+        """Get tool definition for LLM (shared; callers must not mutate it)"""
+        return self._DEFINITION
     
     def get_parameters(self) -> Dict[str, Any]:
         """Get tool parameters schema"""
-        return {}
+        return self.PARAMETERS
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the tool"""
@@ -79,34 +171,59 @@ class BaseTool:
     async def cleanup(self):
         """Cleanup tool resources"""
         pass
+    
+    def _client(self, service: str, region: Optional[str] = None):
+        """Return the shared boto3 client for a service, creating it if needed"""
+        key = _client_key(service, region)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = boto3.client(
+                service,
+                region_name=region or settings.AWS_REGION,
+                config=AWS_CLIENT_CONFIG
+            )
+        return client
+    
+    async def _paginate(
+        self,
+        service: str,
+        operation: str,
+        region: Optional[str] = None,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """Fetch every page of a paginated call in a worker thread"""
+        paginator = self._client(service, region).get_paginator(operation)
+        # boto3 is blocking, and each page needs the previous page's token
+        return await asyncio.to_thread(lambda: list(paginator.paginate(**kwargs)))
 
 
 class AWSInfrastructureTool(BaseTool):
     """Tool for managing AWS infrastructure"""
     
+    __slots__ = ()
+    
     name = "aws_infrastructure"
     description = "Query and manage AWS infrastructure (EC2, Lambda, S3, etc.)"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "action": {
-                "type": "string",
-                "description": "Action to perform: 'list' (to list/describe resources)",
-                "required": True,
-                "example": "list"
-            },
-            "service": {
-                "type": "string",
-                "description": "AWS service: 'ec2' (for EC2 instances), 'lambda' (for Lambda functions), 's3' (for S3 buckets)",
-                "required": True,
-                "example": "ec2"
-            },
-            "resource_id": {
-                "type": "string",
-                "description": "Specific resource ID (optional, for describe operations)",
-                "required": False
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "action": {
+            "type": "string",
+            "description": "Action to perform: 'list' (to list/describe resources)",
+            "required": True,
+            "example": "list"
+        },
+        "service": {
+            "type": "string",
+            "description": "AWS service: 'ec2' (for EC2 instances), 'lambda' (for Lambda functions), 's3' (for S3 buckets)",
+            "required": True,
+            "example": "ec2"
+        },
+        "resource_id": {
+            "type": "string",
+            "description": "Specific resource ID (optional, for describe operations)",
+            "required": False
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute AWS infrastructure operation"""
@@ -136,26 +253,32 @@ class AWSInfrastructureTool(BaseTool):
                     "message": f"Unsupported action '{action}' for service '{service}'. Try: action='list', service='ec2'"
                 }
         except Exception as e:
-            logger.error(f"Error executing AWS tool: {e}")
+            logger.error("Error executing AWS tool: %s", e)
             return {
                 "success": False,
                 "error": str(e)
             }
     
     async def _list_ec2_instances(self) -> Dict[str, Any]:
-        """List EC2 instances"""
-        ec2 = boto3.client('ec2', region_name=settings.AWS_REGION)
-        response = ec2.describe_instances()
+        """List EC2 instances in all configured regions"""
+        region_pages = await asyncio.gather(*(
+            self._paginate('ec2', 'describe_instances', region, PaginationConfig={'PageSize': 1000})
+            for region in _tool_regions()
+        ))
         
-        instances = []
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instances.append({
-                    'id': instance['InstanceId'],
-                    'type': instance['InstanceType'],
-                    'state': instance['State']['Name'],
-                    'launch_time': str(instance['LaunchTime'])
-                })
+        instances = [
+            {
+                'id': instance['InstanceId'],
+                'type': instance['InstanceType'],
+                'state': instance['State']['Name'],
+                'launch_time': str(instance['LaunchTime']),
+                'region': region
+            }
+            for region, pages in zip(_tool_regions(), region_pages)
+            for page in pages
+            for reservation in page['Reservations']
+            for instance in reservation['Instances']
+        ]
         
         return {
             "success": True,
@@ -164,18 +287,23 @@ class AWSInfrastructureTool(BaseTool):
         }
     
     async def _list_lambda_functions(self) -> Dict[str, Any]:
-        """List Lambda functions"""
-        lambda_client = boto3.client('lambda', region_name=settings.AWS_REGION)
-        response = lambda_client.list_functions()
+        """List Lambda functions in all configured regions"""
+        region_pages = await asyncio.gather(*(
+            self._paginate('lambda', 'list_functions', region)
+            for region in _tool_regions()
+        ))
         
         functions = [
             {
                 'name': func['FunctionName'],
-                'runtime': func['Runtime'],
+                'runtime': func.get('Runtime'),  # Container image functions have no runtime
                 'memory': func['MemorySize'],
-                'timeout': func['Timeout']
+                'timeout': func['Timeout'],
+                'region': region
             }
-            for func in response['Functions']
+            for region, pages in zip(_tool_regions(), region_pages)
+            for page in pages
+            for func in page['Functions']
         ]
         
         return {
@@ -186,8 +314,8 @@ class AWSInfrastructureTool(BaseTool):
     
     async def _list_s3_buckets(self) -> Dict[str, Any]:
         """List S3 buckets"""
-        s3 = boto3.client('s3', region_name=settings.AWS_REGION)
-        response = s3.list_buckets()
+        # Buckets are global and list_buckets returns them all in one call
+        response = await asyncio.to_thread(self._client('s3').list_buckets)
         
         buckets = [
             {
@@ -207,22 +335,23 @@ class AWSInfrastructureTool(BaseTool):
 class CodeAnalysisTool(BaseTool):
     """Tool for analyzing code"""
     
+    __slots__ = ()
+    
     name = "code_analysis"
     description = "Analyze code for bugs, security issues, and best practices"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "code": {
-                "type": "string",
-                "description": "Code to analyze",
-                "required": True
-            },
-            "language": {
-                "type": "string",
-                "description": "Programming language",
-                "required": True
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "code": {
+            "type": "string",
+            "description": "Code to analyze",
+            "required": True
+        },
+        "language": {
+            "type": "string",
+            "description": "Programming language",
+            "required": True
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze code"""
@@ -233,20 +362,7 @@ class CodeAnalysisTool(BaseTool):
         
         # Simple code analysis (in production, use proper linters)
         if language == 'python':
-            # Check for common issues
-            if 'eval(' in code:
-                issues.append({
-                    'severity': 'high',
-                    'message': 'Use of eval() is a security risk',
-                    'line': code.find('eval(')
-                })
-            
-            if 'import *' in code:
-                issues.append({
-                    'severity': 'medium',
-                    'message': 'Wildcard imports are discouraged',
-                    'line': code.find('import *')
-                })
+            issues = self._analyze_python(code)
         
         return {
             "success": True,
@@ -258,22 +374,72 @@ class CodeAnalysisTool(BaseTool):
                 "Include docstrings"
             ]
         }
+    
+    @staticmethod
+    def _analyze_python(code: str) -> List[Dict[str, Any]]:
+        """Find common Python issues in one pass, with 1-based line numbers"""
+        issues = []
+        
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            # Snippets may not parse; null bytes raise ValueError on some
+            # versions and very deep nesting RecursionError or MemoryError.
+            # Scan the text instead
+            for match in _PY_ISSUE_RE.finditer(code):
+                line = code.count('\n', 0, match.start()) + 1
+                if match.group('call'):
+                    issues.append(CodeAnalysisTool._dangerous_call_issue(match.group('call'), line))
+                else:
+                    issues.append(CodeAnalysisTool._wildcard_import_issue(line))
+            return issues
+        
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id in _DANGEROUS_CALLS
+            ):
+                issues.append(CodeAnalysisTool._dangerous_call_issue(node.func.id, node.lineno))
+            elif isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names):
+                issues.append(CodeAnalysisTool._wildcard_import_issue(node.lineno))
+        
+        # ast.walk is breadth-first; report in source order
+        issues.sort(key=lambda issue: issue['line'])
+        return issues
+    
+    @staticmethod
+    def _dangerous_call_issue(name: str, line: int) -> Dict[str, Any]:
+        return {
+            'severity': 'high',
+            'message': f'Use of {name}() is a security risk',
+            'line': line
+        }
+    
+    @staticmethod
+    def _wildcard_import_issue(line: int) -> Dict[str, Any]:
+        return {
+            'severity': 'medium',
+            'message': 'Wildcard imports are discouraged',
+            'line': line
+        }
 
 
 class WebSearchTool(BaseTool):
     """Tool for searching the web"""
     
+    __slots__ = ()
+    
     name = "web_search"
     description = "Search the web for documentation, solutions, and information"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "query": {
-                "type": "string",
-                "description": "Search query",
-                "required": True
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "query": {
+            "type": "string",
+            "description": "Search query",
+            "required": True
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Search the web"""
@@ -296,22 +462,23 @@ class WebSearchTool(BaseTool):
 class CodeExecutionTool(BaseTool):
     """Tool for executing code safely"""
     
+    __slots__ = ()
+    
     name = "code_execution"
     description = "Execute code in a sandboxed environment"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "code": {
-                "type": "string",
-                "description": "Code to execute",
-                "required": True
-            },
-            "language": {
-                "type": "string",
-                "description": "Programming language",
-                "required": True
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "code": {
+            "type": "string",
+            "description": "Code to execute",
+            "required": True
+        },
+        "language": {
+            "type": "string",
+            "description": "Programming language",
+            "required": True
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Execute code"""
@@ -332,17 +499,18 @@ class CodeExecutionTool(BaseTool):
 class KnowledgeBaseTool(BaseTool):
     """Tool for querying RAG knowledge base"""
     
+    __slots__ = ()
+    
     name = "knowledge_base"
     description = "Query internal documentation and knowledge base using RAG"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "query": {
-                "type": "string",
-                "description": "Query for knowledge base",
-                "required": True
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "query": {
+            "type": "string",
+            "description": "Query for knowledge base",
+            "required": True
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Query knowledge base"""
@@ -364,22 +532,23 @@ class KnowledgeBaseTool(BaseTool):
 class CostAnalysisTool(BaseTool):
     """Tool for analyzing AWS costs"""
     
+    __slots__ = ()
+    
     name = "cost_analysis"
     description = "Analyze AWS costs and provide optimization recommendations"
     
-    def get_parameters(self) -> Dict[str, Any]:
-        return {
-            "time_period": {
-                "type": "string",
-                "description": "Time period: last_month, last_week, today",
-                "required": True
-            }
+    PARAMETERS: Dict[str, Any] = {
+        "time_period": {
+            "type": "string",
+            "description": "Time period: last_month, last_week, today",
+            "required": True
         }
+    }
     
     async def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze costs"""
         try:
-            ce = boto3.client('ce', region_name=settings.AWS_REGION)
+            ce = self._client('ce')
             
             # Get cost data
             # In production, query actual cost data
@@ -1,9 +1,11 @@
 """
 API Routes for the DevOps Intelligence Agent
 """
+import orjson
 import logging
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
@@ -54,13 +56,43 @@ async def chat(request: ChatRequest, req: Request):
             context=request.context
         )
         
-        return ChatResponse(**result)
+        if 'error' in result:
+            raise HTTPException(status_code=500, detail=result['error'])
         
+        # response_model validates and serializes the dict in one pass;
+        # building ChatResponse here would validate it twice
+        return result
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}", exc_info=True)
+        logger.exception("Error in chat endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, req: Request):
+    """
+    Process a chat message and stream the response
+    
+    Emits Server-Sent Events: "reasoning_delta" events with the agent's
+    reasoning as it is generated, a "reasoning" event once actions have
+    run, "delta" events with response text as it is generated, and a
+    final "done" event carrying the same payload as /chat.
+    """
+    agent = req.app.state.agent
+    
+    async def event_stream():
+        async for event in agent.process_message_stream(
+            message=request.message,
+            session_id=request.session_id,
+            context=request.context
+        ):
+            yield b"data: " + orjson.dumps(event, default=str) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/approve-action")
 async def approve_action(request: ActionApprovalRequest, req: Request):
     """
@@ -77,7 +109,7 @@ async def approve_action(request: ActionApprovalRequest, req: Request):
         return result
         
     except Exception as e:
-        logger.error(f"Error approving action: {e}", exc_info=True)
+        logger.exception("Error approving action: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -97,7 +129,7 @@ async def get_history(session_id: str, req: Request):
         }
         
     except Exception as e:
-        logger.error(f"Error getting history: {e}", exc_info=True)
+        logger.exception("Error getting history: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -116,6 +148,6 @@ async def get_tools(req: Request):
         }
         
     except Exception as e:
-        logger.error(f"Error getting tools: {e}", exc_info=True)
+        logger.exception("Error getting tools: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -12,16 +12,43 @@ class Settings(BaseSettings):
     # AWS Configuration
     AWS_REGION: str = Field(default="us-east-1")
     AWS_ACCOUNT_ID: str = Field(default="")
+    # Regions the AWS tools list resources in; defaults to AWS_REGION only
+    AWS_REGIONS: List[str] = Field(default=[])
     
     # Bedrock Configuration
     BEDROCK_MODEL_ID: str = Field(default="anthropic.claude-3-sonnet-20240229-v1:0")
     BEDROCK_AGENT_ID: str = Field(default="")
     BEDROCK_AGENT_ALIAS_ID: str = Field(default="")
+    BEDROCK_LATENCY_OPTIMIZED: bool = Field(default=False)
+    ENABLE_PROMPT_CACHE: bool = Field(default=False)
+    
+    # Bedrock Micro-batching
+    ENABLE_BEDROCK_BATCHING: bool = Field(default=False)
+    BEDROCK_BATCH_MAX_SIZE: int = Field(default=8)
+    BEDROCK_BATCH_MAX_CONCURRENCY: int = Field(default=16)
+    BEDROCK_BATCH_MAX_WINDOW: float = Field(default=0.02)
+    
+    # Semantic Cache Configuration
+    ENABLE_SEMANTIC_CACHE: bool = Field(default=False)
+    EMBEDDING_MODEL_ID: str = Field(default="amazon.titan-embed-text-v2:0")
+    SEMANTIC_CACHE_THRESHOLD: float = Field(default=0.92)
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(default=512)
+    SEMANTIC_CACHE_TTL_SECONDS: int = Field(default=3600)
+    ENABLE_PLAN_CACHE: bool = Field(default=False)
+    PLAN_CACHE_MAX_ENTRIES: int = Field(default=256)
     
     # Application Configuration
     APP_NAME: str = Field(default="DevOps-Intelligence-Agent")
     ENVIRONMENT: str = Field(default="development")
     LOG_LEVEL: str = Field(default="INFO")
+    # Open AWS connections at startup; sends a billed 1-token Bedrock request
+    ENABLE_STARTUP_WARMUP: bool = Field(default=False)
+    
+    # Conversation History
+    # Limit reasoning context to messages this recent; 0 (default) reads all
+    HISTORY_MAX_AGE_HOURS: int = Field(default=0)
+    # Messages the in-memory store keeps per session; older ones are dropped
+    MAX_HISTORY: int = Field(default=1000)
     
     # API Configuration
     API_PORT: int = Field(default=8000)
@@ -35,6 +35,10 @@ async def lifespan(app: FastAPI):
     app.state.agent = DevOpsAgent()
     await app.state.agent.initialize()
     
+    if settings.ENABLE_STARTUP_WARMUP:
+        # Take connection and credential setup off the first request's latency
+        await app.state.agent.warm_up()
+    
     logger.info("Agent initialized successfully")
     yield
     
@@ -87,7 +91,7 @@ async def health_check():
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -98,6 +102,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 if __name__ == "__main__":
+    import importlib.util
     import uvicorn
     
     uvicorn.run(
@@ -105,6 +110,9 @@ if __name__ == "__main__":
         host=settings.API_HOST,
         port=settings.API_PORT,
         reload=settings.ENVIRONMENT == "development",
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        # Same event loop and HTTP parser as the Docker image, when installed
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11"
     )
 
@@ -1,33 +1,129 @@
 """
 DynamoDB storage for conversations and agent state
 """
-import json
+import asyncio
 import logging
-from typing import Dict, Any, List
-from datetime import datetime
+import random
+import uuid
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 import boto3
-from boto3.dynamodb.conditions import Key
+import orjson
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
 
 from src.config import settings
+from src.utils.aws import DYNAMODB_CLIENT_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Tables confirmed to exist in this process; later stores skip the DescribeTable
+_known_tables = set()
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+# BatchWriteItem accepts at most 25 puts per request
+_BATCH_WRITE_SIZE = 25
+# Chunks in flight at once during bulk_add; more risks hot-partition throttling
+_BULK_WRITE_CONCURRENCY = 4
+_BULK_WRITE_MAX_ATTEMPTS = 8
+
+
+@lru_cache(maxsize=None)
+def _get_dynamodb_client(region: str):
+    """
+    Low-level DynamoDB client shared by every store in the process
+    
+    Unlike resources, clients are thread-safe, so the worker threads that
+    run blocking calls share it and its connection pool.
+    """
+    return boto3.Session().client(
+        'dynamodb',
+        region_name=region,
+        config=DYNAMODB_CLIENT_CONFIG
+    )
+
+
+def _to_attribute(value: Any) -> Any:
+    """Convert floats to Decimal, the only number type boto3 will serialize"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: _to_attribute(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_attribute(item) for item in value]
+    return value
+
+
+def _from_attribute(value: Any) -> Any:
+    """Convert DynamoDB Decimals back to int or float"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {key: _from_attribute(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_attribute(item) for item in value]
+    return value
+
+
+def _to_item(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Python values as DynamoDB attribute values for the low-level client"""
+    return {key: _serializer.serialize(_to_attribute(value)) for key, value in values.items()}
+
+
+def _from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """DynamoDB attribute values from the low-level client as Python values"""
+    return {key: _from_attribute(_deserializer.deserialize(value)) for key, value in item.items()}
+
+
+def _sort_key(timestamp: str, batch_id: str, index: int) -> str:
+    """
+    Sort key for a message: its ISO timestamp plus a unique suffix
+    
+    The suffix is a random id for the write plus the message's position
+    in it. Messages written together can never collide, and a 32-bit id
+    makes collisions with another write in the same microsecond
+    negligible. Keys still order and range-compare by time.
+    """
+    return f"{timestamp}#{batch_id}{index:06x}"
+
+
+def _timestamp_from_key(sort_key: str) -> str:
+    """ISO timestamp part of a sort key (older items have no suffix)"""
+    return sort_key.partition('#')[0]
+
+
+def _load_metadata(value: Any) -> Dict[str, Any]:
+    """Decode stored metadata; items written before maps were used hold a JSON string"""
+    if isinstance(value, str):
+        return orjson.loads(value)
+    return _from_attribute(value or {})
+
 
 class ConversationStore:
-    """Store and retrieve conversation history"""
+    """
+    Store and retrieve conversation history
+    
+    Blocking boto3 calls run in worker threads on one shared client.
+    """
     
     def __init__(self):
-        self.dynamodb = None
-        self.conversations_table = None
-        self.sessions_table = None
+        self.client = None
+        self.conversations_table_name = settings.DYNAMODB_CONVERSATIONS_TABLE
+        self.sessions_table_name = settings.DYNAMODB_SESSIONS_TABLE
     
     async def initialize(self):
         """Initialize DynamoDB connection"""
-        self.dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
+        # Built on the event loop thread; boto3's session setup isn't thread-safe
+        self.client = _get_dynamodb_client(settings.AWS_REGION)
         
         # Get or create tables
-        self.conversations_table = await self._get_or_create_table(
-            settings.DYNAMODB_CONVERSATIONS_TABLE,
+        await self._get_or_create_table(
+            self.conversations_table_name,
             key_schema=[
                 {'AttributeName': 'session_id', 'KeyType': 'HASH'},
                 {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
@@ -38,8 +134,8 @@ class ConversationStore:
             ]
         )
         
-        self.sessions_table = await self._get_or_create_table(
-            settings.DYNAMODB_SESSIONS_TABLE,
+        await self._get_or_create_table(
+            self.sessions_table_name,
             key_schema=[
                 {'AttributeName': 'session_id', 'KeyType': 'HASH'}
             ],
@@ -57,21 +153,34 @@ class ConversationStore:
         attribute_definitions: List[Dict]
     ):
         """Get existing table or create if it doesn't exist"""
+        if table_name in _known_tables:
+            return
+        
         try:
-            table = self.dynamodb.Table(table_name)
-            table.load()
-            logger.info(f"Using existing table: {table_name}")
-            return table
-        except:
-            logger.info(f"Creating table: {table_name}")
-            table = self.dynamodb.create_table(
+            await self._call('describe_table', TableName=table_name)
+            logger.info("Using existing table: %s", table_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            logger.info("Creating table: %s", table_name)
+            
+            await self._call(
+                'create_table',
                 TableName=table_name,
                 KeySchema=key_schema,
                 AttributeDefinitions=attribute_definitions,
                 BillingMode='PAY_PER_REQUEST'
             )
-            table.wait_until_exists()
-            return table
+            await asyncio.to_thread(
+                self.client.get_waiter('table_exists').wait,
+                TableName=table_name
+            )
+        
+        _known_tables.add(table_name)
+    
+    async def _call(self, operation: str, **kwargs) -> Any:
+        """Run a client operation in a worker thread"""
+        return await asyncio.to_thread(getattr(self.client, operation), **kwargs)
     
     async def add_message(
         self,
@@ -81,68 +190,196 @@ class ConversationStore:
         metadata: Dict[str, Any] = None
     ):
         """Add a message to conversation history"""
+        await self.add_messages(
+            session_id,
+            [{'role': role, 'content': content, 'metadata': metadata}]
+        )
+    
+    async def add_messages(
+        self,
+        session_id: str,
+        messages: List[Dict[str, Any]]
+    ):
+        """
+        Add several messages to conversation history in one batch write
+        
+        Each message is a dict with 'role' and 'content', and optionally
+        'timestamp' and 'metadata'. Messages without a timestamp are
+        stamped in list order so they keep distinct sort keys.
+        """
+        if not messages:
+            return
+        
         try:
-            timestamp = datetime.utcnow().isoformat()
+            items = self._build_items(session_id, messages)
+            for start in range(0, len(items), _BATCH_WRITE_SIZE):
+                await self._batch_write_chunk(items[start:start + _BATCH_WRITE_SIZE])
+            await self._touch_session(session_id, items)
             
-            self.conversations_table.put_item(
-                Item={
-                    'session_id': session_id,
-                    'timestamp': timestamp,
-                    'role': role,
-                    'content': content,
-                    'metadata': json.dumps(metadata or {})
-                }
-            )
+        except Exception as e:
+            logger.error("Error adding messages: %s", e)
+            raise
+    
+    async def bulk_add(
+        self,
+        session_id: str,
+        messages: List[Dict[str, Any]]
+    ):
+        """
+        Import a large batch of messages, e.g. when replaying a session
+        
+        Takes the same message dicts as add_messages, but sends chunks of
+        25 as concurrent BatchWriteItem requests and retries unprocessed
+        items with jittered exponential backoff.
+        """
+        if not messages:
+            return
+        
+        try:
+            items = self._build_items(session_id, messages)
+            semaphore = asyncio.Semaphore(_BULK_WRITE_CONCURRENCY)
             
-            # Update session last activity
-            self.sessions_table.put_item(
-                Item={
-                    'session_id': session_id,
-                    'last_activity': timestamp,
-                    'message_count': await self._get_message_count(session_id)
-                }
-            )
+            async def write_chunk(chunk: List[Dict[str, Any]]):
+                async with semaphore:
+                    await self._batch_write_chunk(chunk)
+            
+            await asyncio.gather(*[
+                write_chunk(items[start:start + _BATCH_WRITE_SIZE])
+                for start in range(0, len(items), _BATCH_WRITE_SIZE)
+            ])
+            await self._touch_session(session_id, items)
             
         except Exception as e:
-            logger.error(f"Error adding message: {e}")
+            logger.error("Error bulk adding messages: %s", e)
             raise
     
+    @staticmethod
+    def _build_items(
+        session_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Turn message dicts into conversation table items"""
+        now = datetime.now(timezone.utc)
+        batch_id = uuid.uuid4().hex[:8]
+        return [
+            {
+                'session_id': session_id,
+                'timestamp': _sort_key(
+                    message.get('timestamp') or (now + timedelta(microseconds=index)).isoformat(timespec='microseconds'),
+                    batch_id,
+                    index
+                ),
+                'role': message['role'],
+                'content': message['content'],
+                'metadata': _to_attribute(message.get('metadata') or {})
+            }
+            for index, message in enumerate(messages)
+        ]
+    
+    async def _touch_session(
+        self,
+        session_id: str,
+        items: List[Dict[str, Any]]
+    ):
+        """Record newly written items on the session"""
+        # Update session last activity; ADD keeps the count atomic
+        # under concurrent writers without re-counting the partition
+        await self._call(
+            'update_item',
+            TableName=self.sessions_table_name,
+            Key=_to_item({'session_id': session_id}),
+            UpdateExpression='SET last_activity = :t ADD message_count :n',
+            ExpressionAttributeValues=_to_item({
+                ':t': max(_timestamp_from_key(item['timestamp']) for item in items),
+                ':n': len(items)
+            })
+        )
+    
+    async def _batch_write_chunk(self, items: List[Dict[str, Any]]):
+        """Write up to 25 items, retrying unprocessed ones with backoff"""
+        table_name = self.conversations_table_name
+        requests = [{'PutRequest': {'Item': _to_item(item)}} for item in items]
+        delay = 0.05
+        
+        for _ in range(_BULK_WRITE_MAX_ATTEMPTS):
+            response = await self._call('batch_write_item', RequestItems={table_name: requests})
+            requests = response.get('UnprocessedItems', {}).get(table_name)
+            if not requests:
+                return
+            
+            # Full jitter keeps concurrent chunks from retrying in lockstep
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, 2.0)
+        
+        raise RuntimeError(f"{len(requests)} items still unprocessed after {_BULK_WRITE_MAX_ATTEMPTS} attempts")
+    
+    async def iter_history(
+        self,
+        session_id: str,
+        page_size: int = 50,
+        since: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield messages most recent first
+        
+        Pages are queried only as the caller consumes them, so stopping
+        early skips the remaining reads. With `since` (an ISO timestamp),
+        older messages are excluded by the key condition itself.
+        """
+        key_condition = '#s = :s'
+        values = {':s': session_id}
+        if since:
+            key_condition += ' AND #t >= :since'
+            values[':since'] = since
+        
+        query_kwargs = {
+            'TableName': self.conversations_table_name,
+            'KeyConditionExpression': key_condition,
+            # Only what callers read; role and timestamp are reserved words
+            'ProjectionExpression': '#r, #c, #t, #m',
+            'ExpressionAttributeNames': {
+                '#s': 'session_id', '#r': 'role', '#c': 'content', '#t': 'timestamp', '#m': 'metadata'
+            },
+            'ExpressionAttributeValues': _to_item(values),
+            'Limit': page_size,
+            'ScanIndexForward': False  # Most recent first
+        }
+        
+        while True:
+            response = await self._call('query', **query_kwargs)
+            
+            for item in map(_from_item, response['Items']):
+                yield {
+                    'role': item['role'],
+                    'content': item['content'],
+                    'timestamp': _timestamp_from_key(item['timestamp']),
+                    'metadata': _load_metadata(item.get('metadata'))
+                }
+            
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return
+            query_kwargs['ExclusiveStartKey'] = last_key
+    
     async def get_history(
         self,
         session_id: str,
-        limit: int = 50
+        limit: int = 50,
+        since: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Retrieve conversation history"""
+        """Retrieve conversation history, optionally only messages at or after `since`"""
         try:
-            response = self.conversations_table.query(
-                KeyConditionExpression=Key('session_id').eq(session_id),
-                Limit=limit,
-                ScanIndexForward=False  # Most recent first
-            )
-            
             messages = []
-            for item in reversed(response['Items']):  # Reverse to get chronological order
-                messages.append({
-                    'role': item['role'],
-                    'content': item['content'],
-                    'timestamp': item['timestamp'],
-                    'metadata': json.loads(item.get('metadata', '{}'))
-                })
+            # Close the generator on break rather than leaving it to GC
+            async with aclosing(self.iter_history(session_id, page_size=limit, since=since)) as history:
+                async for message in history:
+                    messages.append(message)
+                    if len(messages) >= limit:
+                        break
             
+            messages.reverse()  # Chronological order
             return messages
             
         except Exception as e:
-            logger.error(f"Error retrieving history: {e}")
+            logger.error("Error retrieving history: %s", e)
             return []
-    
-    async def _get_message_count(self, session_id: str) -> int:
-        """Get message count for a session"""
-        try:
-            response = self.conversations_table.query(
-                KeyConditionExpression=Key('session_id').eq(session_id),
-                Select='COUNT'
-            )
-            return response['Count']
-        except:
-            return 0
-
@@ -2,8 +2,12 @@
 In-memory storage (for testing without DynamoDB)
 """
 import logging
-from typing import Dict, Any, List
-from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice, takewhile
+from typing import Any, AsyncIterator, Dict, List, Optional
+from collections import defaultdict, deque
+
+from src.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +16,8 @@ class MemoryConversationStore:
     """Store conversations in memory instead of DynamoDB"""
     
     def __init__(self):
-        self.conversations = defaultdict(list)
+        # Bounded per session: appends and evictions are O(1)
+        self.conversations = defaultdict(lambda: deque(maxlen=settings.MAX_HISTORY))
         self.sessions = {}
     
     async def initialize(self):
@@ -27,27 +32,68 @@ class MemoryConversationStore:
         metadata: Dict[str, Any] = None
     ):
         """Add a message to conversation history"""
-        from datetime import datetime
+        await self.add_messages(
+            session_id,
+            [{'role': role, 'content': content, 'metadata': metadata}]
+        )
+    
+    async def add_messages(
+        self,
+        session_id: str,
+        messages: List[Dict[str, Any]]
+    ):
+        """
+        Add several messages to conversation history
         
-        message = {
-            'role': role,
-            'content': content,
-            'timestamp': datetime.utcnow().isoformat(),
-            'metadata': metadata or {}
-        }
+        Same message dicts as ConversationStore.add_messages; a message's
+        own 'timestamp' is kept when given.
+        """
+        if not messages:
+            return
+        
+        added = [
+            {
+                'role': message['role'],
+                'content': message['content'],
+                'timestamp': message.get('timestamp') or datetime.now(timezone.utc).isoformat(timespec='microseconds'),
+                'metadata': message.get('metadata') or {}
+            }
+            for message in messages
+        ]
+        self.conversations[session_id].extend(added)
         
-        self.conversations[session_id].append(message)
         self.sessions[session_id] = {
-            'last_activity': message['timestamp'],
-            'message_count': len(self.conversations[session_id])
+            'last_activity': max(message['timestamp'] for message in added),
+            # Total ever added, not just the messages still retained
+            'message_count': self.sessions.get(session_id, {}).get('message_count', 0) + len(messages)
         }
     
+    async def iter_history(
+        self,
+        session_id: str,
+        page_size: int = 50,
+        since: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield messages most recent first"""
+        # Snapshot, so writes while the caller is suspended can't break iteration
+        for message in list(reversed(self.conversations.get(session_id, ()))):
+            if since and message['timestamp'] < since:
+                return
+            yield message
+    
     async def get_history(
         self,
         session_id: str,
-        limit: int = 50
+        limit: int = 50,
+        since: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Retrieve conversation history"""
-        messages = self.conversations.get(session_id, [])
-        return messages[-limit:] if messages else []
+        """Retrieve conversation history, optionally only messages at or after `since`"""
+        # Walk back from the newest message so only `limit` entries are touched
+        recent = islice(reversed(self.conversations.get(session_id, ())), limit)
+        if since:
+            recent = takewhile(lambda message: message['timestamp'] >= since, recent)
+        
+        messages = list(recent)
+        messages.reverse()
+        return messages
 
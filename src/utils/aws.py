@@ -0,0 +1,19 @@
+"""
+Shared AWS client configuration
+"""
+from botocore.config import Config
+
+# Connection pool and retry settings shared by every AWS client
+AWS_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60
+)
+
+# Long generations and response streams can outlast the default read timeout
+BEDROCK_CLIENT_CONFIG = AWS_CLIENT_CONFIG.merge(Config(read_timeout=300))
+
+# DynamoDB throttles in bursts; give conversation reads and writes more room to back off
+DYNAMODB_CLIENT_CONFIG = AWS_CLIENT_CONFIG.merge(Config(retries={"mode": "adaptive", "max_attempts": 10}))
@@ -1,11 +1,18 @@
 """
 Tests for DevOps Intelligence Agent
 """
+import asyncio
+import orjson
 import pytest
-from unittest.mock import Mock, AsyncMock, patch
+from unittest.mock import MagicMock, Mock, AsyncMock, patch
+from src.agent.batcher import BedrockBatcher
 from src.agent.bedrock_agent import DevOpsAgent
-from src.agent.reasoning import ReasoningEngine
-from src.agent.tools import ToolRegistry
+from src.agent.fast_router import try_route
+from src.agent.reasoning import PlanCache, ReasoningEngine, _ReasoningFieldStream
+from src.agent.semantic_cache import AnswerCache
+from src.agent.tools import AWSInfrastructureTool, CodeAnalysisTool, ToolRegistry
+from src.storage.dynamodb import ConversationStore
+from src.storage.memory_store import MemoryConversationStore
 
 
 @pytest.mark.asyncio
@@ -13,27 +20,44 @@ async def test_agent_initialization():
     """Test agent initialization"""
     agent = DevOpsAgent()
     
-    with patch('boto3.client'):
+    with patch('src.agent.bedrock_agent.aioboto3.Session') as session_cls, \
+            patch('src.agent.bedrock_agent.ConversationStore') as store_cls:
+        dynamodb = session_cls.return_value.resource.return_value.__aenter__.return_value
+        dynamodb.Table = AsyncMock()
+        store_cls.return_value.initialize = AsyncMock()
         await agent.initialize()
         
         assert agent.bedrock_runtime is not None
         assert agent.tool_registry is not None
         assert agent.reasoning_engine is not None
+        
+        # Warm-up failures are logged, not raised
+        await agent.warm_up()
+        
+        await agent.cleanup()
 
 
-@pytest.mark.asyncio
-async def test_process_message():
-    """Test message processing"""
+@pytest.fixture
+def mocked_agent():
+    """Agent with mocked AWS clients, reasoning engine and conversation store"""
     agent = DevOpsAgent()
     agent.bedrock_runtime = Mock()
+    agent.tool_registry = Mock()
     agent.reasoning_engine = Mock()
+    agent.conversation_store = Mock()
+    agent.conversation_store.get_history = AsyncMock(return_value=[])
+    agent.conversation_store.add_messages = AsyncMock()
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_process_message(mocked_agent):
+    """Test message processing"""
+    agent = mocked_agent
     agent.reasoning_engine.reason = AsyncMock(return_value={
         'reasoning': 'Test reasoning',
         'plan': []
     })
-    agent.conversation_store = Mock()
-    agent.conversation_store.get_history = AsyncMock(return_value=[])
-    agent.conversation_store.add_message = AsyncMock()
     
     result = await agent.process_message(
         message="List EC2 instances",
@@ -56,6 +80,12 @@ async def test_tool_registry():
     assert len(tools) > 0
     assert any(tool['name'] == 'aws_infrastructure' for tool in tools)
     assert any(tool['name'] == 'code_analysis' for tool in tools)
+    # Built once and shared until the tool set changes
+    assert registry.get_tool_definitions() is tools
+    assert registry.tools['web_search'].http is registry.http
+    
+    await registry.cleanup()
+    assert registry.http is None
 
 
 def test_reasoning_prompt_building():
@@ -72,3 +102,592 @@ def test_reasoning_prompt_building():
     assert "Test query" in prompt
     assert "Available Tools" in prompt
 
+
+@pytest.mark.asyncio
+async def test_execute_plan_respects_dependencies():
+    """Test independent steps run together and dependent steps wait"""
+    agent = DevOpsAgent()
+    calls = []
+    
+    async def execute_tool(tool_name, tool_input):
+        calls.append(tool_name)
+        return {"message": tool_name}
+    
+    agent.tool_registry = Mock()
+    agent.tool_registry.execute_tool = execute_tool
+    
+    plan = [
+        {"step": 1, "tool": "cost_analysis", "input": {}, "depends_on": [2]},
+        {"step": 2, "tool": "aws_infrastructure", "input": {}},
+        {"step": 3, "tool": "web_search", "input": {}},
+    ]
+    
+    results = await agent._execute_plan(plan=plan, session_id="test-session")
+    
+    assert [r['tool'] for r in results] == ["cost_analysis", "aws_infrastructure", "web_search"]
+    assert all(r['status'] == "success" for r in results)
+    assert calls.index("cost_analysis") > calls.index("aws_infrastructure")
+
+
+@pytest.mark.asyncio
+async def test_process_message_empty_plan_skips_response_generation(mocked_agent):
+    """Test an empty plan answers directly from the reasoning summary"""
+    agent = mocked_agent
+    agent.reasoning_engine.reason = AsyncMock(return_value={
+        'reasoning': 'Greeting, no tools needed',
+        'plan': [],
+        'user_facing_summary': 'Hello! How can I help?'
+    })
+    agent._generate_response = AsyncMock()
+    
+    result = await agent.process_message(
+        message="Hi",
+        session_id="test-session"
+    )
+    
+    assert result['message'] == 'Hello! How can I help?'
+    assert result['actions_taken'] == []
+    agent._generate_response.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_message_stream(mocked_agent):
+    """Test streamed responses emit reasoning and text deltas and persist the full message"""
+    agent = mocked_agent
+    
+    async def reason_stream(**kwargs):
+        yield {"type": "reasoning_delta", "text": "Test reasoning"}
+        yield {"type": "result", "result": {
+            'reasoning': 'Test reasoning',
+            'plan': [{'step': 1, 'tool': 'web_search', 'input': {}}]
+        }}
+    
+    agent.reasoning_engine.reason_stream = reason_stream
+    agent.tool_registry.execute_tool = AsyncMock(return_value={'success': True})
+    
+    async def stream_response(reasoning, execution_results):
+        for text in ("Hello", " world"):
+            yield text
+    
+    agent._stream_response = stream_response
+    
+    events = [
+        event async for event in agent.process_message_stream(
+            message="Search docs",
+            session_id="test-session"
+        )
+    ]
+    
+    assert [e['type'] for e in events] == ["reasoning_delta", "reasoning", "delta", "delta", "done"]
+    assert events[-1]['message'] == "Hello world"
+    stored = agent.conversation_store.add_messages.call_args.kwargs['messages']
+    assert [(m['role'], m['content']) for m in stored] == [
+        ("user", "Search docs"),
+        ("assistant", "Hello world")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_process_message_stream_reports_broken_reasoning(mocked_agent):
+    """Test a failed or truncated reasoning stream ends in an error event and stops speculation"""
+    agent = mocked_agent
+    started = asyncio.Event()
+    
+    async def slow_tool(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+    
+    agent.tool_registry.execute_tool = slow_tool
+    step = {"step": 1, "tool": "aws_infrastructure", "input": {"service": "ec2"}}
+    
+    async def failing_stream(**kwargs):
+        yield {"type": "plan_step", "step": step}
+        await started.wait()
+        raise RuntimeError("stream dropped")
+    
+    async def truncated_stream(**kwargs):
+        yield {"type": "reasoning_delta", "text": "Thinking"}
+    
+    speculative_tasks = []
+    start_speculative_step = agent._start_speculative_step
+    
+    def start(step, session_id):
+        speculative = start_speculative_step(step, session_id)
+        speculative_tasks.append(speculative[1])
+        return speculative
+    
+    agent._start_speculative_step = start
+    agent.reasoning_engine.reason_stream = failing_stream
+    events = [event async for event in agent.process_message_stream("List EC2", "test-session")]
+    assert events[-1]['type'] == "error"
+    await asyncio.sleep(0)
+    assert speculative_tasks[0].cancelled()
+    
+    agent.reasoning_engine.reason_stream = truncated_stream
+    events = [event async for event in agent.process_message_stream("List EC2", "test-session")]
+    assert [e['type'] for e in events] == ["reasoning_delta", "error"]
+
+
+def test_reasoning_field_stream_decodes_split_chunks():
+    """Test the reasoning value is decoded incrementally across chunk boundaries"""
+    output = _ReasoningFieldStream()
+    chunks = ['{"reas', 'oning": "Check \\', '"EC2\\"\\u00e9', '", "plan": []}']
+    
+    decoded = "".join(output.feed(chunk) for chunk in chunks)
+    
+    assert decoded == 'Check "EC2"\u00e9'
+    assert output.done
+    assert output.text == "".join(chunks)
+    
+    # Surrogate pairs split across chunks decode to one character
+    emoji = _ReasoningFieldStream()
+    pair = emoji.feed('{"reasoning": "ok \\ud83d') + emoji.feed('\\ude80 \\udc00", "plan": []}')
+    assert pair == "ok \U0001F680 \ufffd"
+    orjson.dumps({"text": pair})
+    
+    # Malformed escapes are replaced instead of ending the stream
+    malformed = _ReasoningFieldStream()
+    assert malformed.feed('{"reasoning": "a\\uZZZZb\\ud83d\\u+123"}') == "a\ufffdb\ufffd\ufffd"
+    
+    plan = _ReasoningFieldStream()
+    plan.feed('{"reasoning": "say \\"plan\\": [{}]", "plan": [{"step": 1, "input": {"a": 1}')
+    assert plan.first_plan_step() is None
+    plan.feed('}, {"step": 2')
+    assert plan.first_plan_step() == {"step": 1, "input": {"a": 1}}
+    
+    # The plan key may arrive split after long unrelated output
+    late = _ReasoningFieldStream()
+    late.feed('{"reasoning": "done", "notes": "' + "x" * 500 + '", "pl')
+    assert late.first_plan_step() is None
+    late.feed('an": [{"step": 1}]}')
+    assert late.first_plan_step() == {"step": 1}
+
+
+def test_parse_reasoning_output():
+    """Test JSON extraction from fenced and unfenced LLM output"""
+    engine = ReasoningEngine(Mock(), "test-model")
+    
+    fenced = engine._parse_reasoning_output(
+        'Plan:\n```json\n{"reasoning": "fenced", "plan": [{"step": 1, "input": {}}]}\n```\nDone'
+    )
+    assert fenced['reasoning'] == "fenced"
+    assert fenced['plan'] == [{"step": 1, "input": {}}]
+    
+    unfenced = engine._parse_reasoning_output(
+        'Here you go {"reasoning": "plain", "plan": []} and a stray } brace'
+    )
+    assert unfenced['reasoning'] == "plain"
+    
+    stray = engine._parse_reasoning_output(
+        'Use {braces} carefully: {"reasoning": "after stray", "plan": [{"step": 1}]}'
+    )
+    assert stray['plan'] == [{"step": 1}]
+    
+    fallback = engine._parse_reasoning_output("no json here")
+    assert fallback == {"reasoning": "no json here", "plan": []}
+
+
+@pytest.mark.asyncio
+async def test_reason_direct_dispatch_for_list_queries():
+    """Test simple AWS list queries skip the Bedrock call"""
+    client = Mock()
+    client.invoke_model = AsyncMock()
+    engine = ReasoningEngine(client, "test-model")
+    tools = [{"name": "aws_infrastructure", "description": "AWS"}]
+    
+    result = await engine.reason(
+        query="Show my Lambda functions",
+        history=[],
+        available_tools=tools
+    )
+    
+    assert result['plan'][0]['input'] == {"action": "list", "service": "lambda"}
+    client.invoke_model.assert_not_called()
+    
+    assert try_route("List EC2 instances and their costs", {"aws_infrastructure"}) is None
+    assert try_route("What were my AWS costs last week?")['plan'][0]['input'] == {"time_period": "last_week"}
+    assert try_route("show my costs", {"aws_infrastructure"}) is None
+
+
+def test_reasoning_request_body_prompt_cache():
+    """Test the static prompt sections are marked cacheable only when enabled"""
+    plain = ReasoningEngine(Mock(), "anthropic.claude-3-sonnet")
+    cached = ReasoningEngine(Mock(), "anthropic.claude-3-sonnet", prompt_cache=True)
+    
+    assert isinstance(plain._build_body("hi")['system'], str)
+    
+    body = cached._build_body("hi")
+    assert body['system'][0]['cache_control'] == {"type": "ephemeral"}
+    assert body['messages'] == [{"role": "user", "content": "hi"}]
+    
+    request = cached._build_reasoning_request("Test query", [], [], None)
+    static_block, request_block = request['messages'][0]['content']
+    assert static_block['text'].startswith("Available Tools")
+    assert static_block['cache_control'] == {"type": "ephemeral"}
+    assert "Test query" in request_block['text']
+
+
+@pytest.mark.asyncio
+async def test_bedrock_batcher_dispatches_concurrently():
+    """Test batched calls each get their own response or error"""
+    client = Mock()
+    
+    async def invoke_model(**kwargs):
+        if kwargs['modelId'] == 'bad':
+            raise ValueError("boom")
+        return {"model": kwargs['modelId']}
+    
+    client.invoke_model = invoke_model
+    batcher = BedrockBatcher(client)
+    await batcher.start()
+    
+    results = await asyncio.gather(
+        batcher.invoke_model(modelId='a'),
+        batcher.invoke_model(modelId='b'),
+        batcher.invoke_model(modelId='bad'),
+        return_exceptions=True
+    )
+    await batcher.stop()
+    
+    assert results[0] == {"model": "a"}
+    assert results[1] == {"model": "b"}
+    assert isinstance(results[2], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_bedrock_batcher_dispatches_lone_request_immediately():
+    """Test a request with nothing else queued skips the collection window"""
+    client = Mock()
+    client.invoke_model = AsyncMock(return_value={"model": "a"})
+    batcher = BedrockBatcher(client, min_window=1.0, max_window=1.0)
+    await batcher.start()
+    
+    result = await asyncio.wait_for(batcher.invoke_model(modelId='a'), timeout=0.5)
+    await batcher.stop()
+    
+    assert result == {"model": "a"}
+
+
+@pytest.mark.asyncio
+async def test_execute_plan_stores_pending_actions(mocked_agent):
+    """Test approval-gated steps are stored and failed writes surface as errors"""
+    agent = mocked_agent
+    agent._store_pending_action = AsyncMock(side_effect=[None, RuntimeError("throttled")])
+    
+    plan = [
+        {"step": 1, "tool": "code_execution", "input": {}, "requires_approval": True},
+        {"step": 2, "tool": "aws_infrastructure", "input": {}, "requires_approval": True},
+    ]
+    
+    with patch('src.agent.bedrock_agent.settings.ENABLE_HUMAN_APPROVAL', True):
+        results = await agent._execute_plan(plan=plan, session_id="test-session")
+    
+    assert results[0]['status'] == "pending_approval"
+    assert results[0]['action_id'].startswith("test-session-")
+    assert results[1]['status'] == "error"
+    assert agent._store_pending_action.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_matches_similar_queries():
+    """Test cached plans are reused only for similar queries with the same tools"""
+    vectors = {
+        "list my ec2 instances and costs": [1.0, 0.0],
+        "show ec2 instances and costs": [0.99, 0.14],
+        "review my code": [0.0, 1.0],
+    }
+    client = Mock()
+    
+    async def invoke_model(modelId, body):
+        response_body = Mock()
+        response_body.read = AsyncMock(return_value=orjson.dumps({
+            "embedding": vectors[orjson.loads(body)["inputText"]]
+        }))
+        return {"body": response_body}
+    
+    client.invoke_model = AsyncMock(side_effect=invoke_model)
+    cache = AnswerCache(client, "titan")
+    tools = [{"name": "aws_infrastructure"}, {"name": "cost_analysis"}]
+    result = {"reasoning": "cached", "plan": [{"step": 1}]}
+    
+    # A miss followed by put() embeds the query only once
+    assert await cache.get("List my EC2 instances and costs", tools) is None
+    cache.put("List my EC2 instances and costs", tools, result)
+    assert client.invoke_model.await_count == 1
+    
+    hit = await cache.get("Show EC2 instances and costs", tools)
+    assert hit == result
+    hit['plan'].clear()
+    assert await cache.get("Show EC2 instances and costs", tools) == result
+    assert await cache.get("Review my code", tools) is None
+    assert await cache.get("Show EC2 instances and costs", tools[:1]) is None
+    
+    # Without a preceding lookup the embedding is computed in the background
+    cache.put("Review my code", tools, {"reasoning": "code", "plan": []})
+    await asyncio.gather(*cache._pending)
+    assert (await cache.get("review my code", tools))['reasoning'] == "code"
+
+
+@pytest.mark.asyncio
+async def test_reason_skips_caches_for_follow_ups():
+    """Test cached plans are neither used nor stored for turns with history"""
+    answer_cache = Mock()
+    answer_cache.get = AsyncMock(return_value={"reasoning": "cached", "plan": [{"step": 1}]})
+    plan_cache = Mock()
+    bedrock = Mock()
+    bedrock.invoke_model = AsyncMock(side_effect=RuntimeError("offline"))
+    engine = ReasoningEngine(bedrock, "anthropic.claude-3", answer_cache=answer_cache, plan_cache=plan_cache)
+    history = [{"role": "user", "content": "list ec2 in us-east-1", "timestamp": "1"}]
+    
+    await engine.reason("yes, do the same for us-west-2", history, [{"name": "aws_infrastructure", "description": ""}])
+    
+    answer_cache.get.assert_not_called()
+    answer_cache.put.assert_not_called()
+    plan_cache.get.assert_not_called()
+    bedrock.invoke_model.assert_awaited_once()
+
+
+def test_plan_cache_reuses_templates_across_entities():
+    """Test plan templates are parameterized by query entities and invalidated"""
+    cache = PlanCache()
+    cache.put("List EC2 instances in us-east-1", {
+        "reasoning": "LLM plan",
+        "plan": [{"step": 1, "tool": "aws_infrastructure",
+                  "input": {"action": "list", "service": "ec2", "region": "us-east-1"}}]
+    })
+    
+    hit = cache.get("list lambda instances in eu-west-2?")
+    assert hit['plan'][0]['input'] == {"action": "list", "service": "lambda", "region": "eu-west-2"}
+    assert cache.get("list ec2 and s3 instances in us-east-1") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    cache.invalidate(hit['plan_intent'])
+    assert cache.get("list s3 instances in us-east-1") is None
+    
+    # Entities in free text are parameterized too
+    cache.put("Why is my Lambda slow in us-east-1?", {
+        "reasoning": "User wants to know why Lambda is slow in us-east-1.",
+        "plan": [
+            {"step": 1, "tool": "aws_infrastructure",
+             "input": {"action": "list", "service": "lambda", "region": "us-east-1"},
+             "rationale": "Check Lambda configuration in us-east-1", "requires_approval": False},
+            {"step": 2, "tool": "knowledge_base", "input": {"query": "lambda cold starts"},
+             "rationale": "Look up common Lambda latency causes", "requires_approval": False}
+        ]
+    })
+    hit = cache.get("why is my ec2 slow in eu-west-2")
+    assert hit['plan'][0]['input'] == {"action": "list", "service": "ec2", "region": "eu-west-2"}
+    assert hit['plan'][0]['rationale'] == "Check ec2 configuration in eu-west-2"
+    assert hit['plan'][1]['input'] == {"query": "ec2 cold starts"}
+    
+    # A plan naming another value of the same entity can't be reused
+    cache.put("why is my s3 slow", {
+        "reasoning": "LLM plan",
+        "plan": [{"step": 1, "tool": "knowledge_base", "input": {"query": "s3 vs ec2 latency"}}]
+    })
+    assert cache.get("why is my lambda slow") is None
+
+
+@pytest.mark.asyncio
+async def test_aws_tool_uses_shared_clients():
+    """Test AWS tools page through results with the client they were given"""
+    lambda_client = Mock()
+    lambda_client.get_paginator.return_value.paginate.return_value = [
+        {"Functions": [{"FunctionName": "a", "Runtime": "python3.11", "MemorySize": 128, "Timeout": 3}]},
+        {"Functions": [{"FunctionName": "b", "MemorySize": 256, "Timeout": 30}]},
+    ]
+    tool = AWSInfrastructureTool({"lambda": lambda_client})
+    
+    result = await tool.execute({"action": "list", "service": "lambda"})
+    
+    assert [f['name'] for f in result['functions']] == ["a", "b"]
+    lambda_client.get_paginator.assert_called_once_with('list_functions')
+
+
+@pytest.mark.asyncio
+async def test_code_analysis_reports_line_numbers():
+    """Test Python issues are found by AST with line numbers, ignoring strings"""
+    tool = CodeAnalysisTool()
+    code = 'from os import *\nlabel = "eval(x)"\n\ndef run(x):\n    return exec(x)\n'
+    
+    result = await tool.execute({"code": code, "language": "python"})
+    
+    assert [(i['line'], i['message']) for i in result['issues']] == [
+        (1, "Wildcard imports are discouraged"),
+        (5, "Use of exec() is a security risk"),
+    ]
+    
+    broken = await tool.execute({"code": "x = (\ny = eval(z)", "language": "python"})
+    assert broken['issues'][0]['line'] == 2
+    
+    # Input ast.parse rejects with other exceptions falls back to the text scan
+    for code in ("x = 1\0\neval(z)", "x = " + "a." * 100000 + "b\neval(z)", "x = " + "not " * 100000 + "1\neval(z)"):
+        result = await tool.execute({"code": code, "language": "python"})
+        assert [issue['line'] for issue in result['issues']] == [2]
+
+
+@pytest.mark.asyncio
+async def test_execute_plan_reuses_speculative_step(mocked_agent):
+    """Test a speculatively started step is reused only if the final plan kept it"""
+    agent = mocked_agent
+    agent.tool_registry.execute_tool = AsyncMock(return_value={"message": "ok"})
+    step = {"step": 1, "tool": "aws_infrastructure", "input": {"service": "ec2"}}
+    
+    speculative = agent._start_speculative_step(step, "test-session")
+    results = await agent._execute_plan(plan=[dict(step)], session_id="test-session", speculative=speculative)
+    
+    assert results[0]['status'] == "success"
+    assert agent.tool_registry.execute_tool.await_count == 1
+    
+    changed = agent._start_speculative_step(step, "test-session")
+    await agent._execute_plan(
+        plan=[{"step": 1, "tool": "aws_infrastructure", "input": {"service": "s3"}}],
+        session_id="test-session",
+        speculative=changed
+    )
+    assert changed[1].cancelled()
+    assert agent._start_speculative_step({**step, "tool": "code_execution"}, "test-session") is None
+
+
+@pytest.fixture
+def dynamodb_store():
+    """ConversationStore backed by a mocked low-level DynamoDB client"""
+    client = MagicMock()
+    client.batch_write_item.return_value = {'UnprocessedItems': {}}
+    
+    store = ConversationStore()
+    store.client = client
+    return store, client
+
+
+@pytest.mark.asyncio
+async def test_conversation_store_batches_messages(dynamodb_store):
+    """A batch is one BatchWriteItem request plus one atomic session update"""
+    store, client = dynamodb_store
+    
+    await store.add_messages("s1", [
+        {'role': 'user', 'content': 'hi'},
+        {'role': 'assistant', 'content': 'hello', 'metadata': {'score': 0.5}}
+    ])
+    
+    client.batch_write_item.assert_called_once()
+    requests = client.batch_write_item.call_args.kwargs['RequestItems'][store.conversations_table_name]
+    user_item, assistant_item = [request['PutRequest']['Item'] for request in requests]
+    # Sort keys are unique even if timestamps collide, and still start with the ISO time
+    user_key, assistant_key = user_item['timestamp']['S'], assistant_item['timestamp']['S']
+    assert user_key != assistant_key and user_key[:4].isdigit() and '#' in user_key
+    assert assistant_key.partition('#')[0].endswith('+00:00')
+    # Metadata is stored as a native map
+    assert assistant_item['metadata'] == {'M': {'score': {'N': '0.5'}}}
+    client.query.assert_not_called()
+    update = client.update_item.call_args.kwargs
+    assert 'ADD message_count :n' in update['UpdateExpression']
+    assert update['ExpressionAttributeValues'] == {
+        ':t': {'S': assistant_key.partition('#')[0]},
+        ':n': {'N': '2'}
+    }
+
+
+@pytest.mark.asyncio
+async def test_conversation_store_bulk_add_retries_unprocessed(dynamodb_store):
+    """bulk_add writes 25-item chunks and resubmits unprocessed items"""
+    store, client = dynamodb_store
+    store.conversations_table_name = "conversations"
+    written = []
+    
+    def batch_write_item(RequestItems):
+        requests = RequestItems["conversations"]
+        assert len(requests) <= 25
+        if len(written) == 0:
+            # Throttle the tail of the first request
+            written.extend(requests[:-5])
+            return {'UnprocessedItems': {"conversations": requests[-5:]}}
+        written.extend(requests)
+        return {'UnprocessedItems': {}}
+    
+    client.batch_write_item = Mock(side_effect=batch_write_item)
+    messages = [{'role': 'user', 'content': str(index)} for index in range(60)]
+    
+    await store.bulk_add("s1", messages)
+    
+    assert client.batch_write_item.call_count == 4
+    assert sorted(int(request['PutRequest']['Item']['content']['S']) for request in written) == list(range(60))
+    # Messages sharing a timestamp keep distinct keys, in list order
+    client.batch_write_item = Mock(return_value={'UnprocessedItems': {}})
+    same_time = [{'role': 'user', 'content': str(index), 'timestamp': '2024-01-01T00:00:00+00:00'} for index in range(60)]
+    await store.bulk_add("s1", same_time)
+    items = sorted(
+        (request['PutRequest']['Item']['timestamp']['S'], int(request['PutRequest']['Item']['content']['S']))
+        for call in client.batch_write_item.call_args_list
+        for request in call.kwargs['RequestItems']["conversations"]
+    )
+    assert len({key for key, _ in items}) == 60
+    assert [content for _, content in items] == list(range(60))
+    assert client.update_item.call_args.kwargs['ExpressionAttributeValues'][':n'] == {'N': '60'}
+
+
+@pytest.mark.asyncio
+async def test_conversation_store_reads_legacy_metadata(dynamodb_store):
+    """History decodes both native-map and JSON-string metadata"""
+    store, client = dynamodb_store
+    client.query.return_value = {'Items': [
+        {'role': {'S': 'assistant'}, 'content': {'S': 'b'}, 'timestamp': {'S': '2'},
+         'metadata': {'M': {'steps': {'N': '2'}, 'score': {'N': '0.5'}}}},
+        {'role': {'S': 'user'}, 'content': {'S': 'a'}, 'timestamp': {'S': '1'},
+         'metadata': {'S': '{"source": "api"}'}}
+    ]}
+    
+    history = await store.get_history("s1")
+    
+    assert [message['metadata'] for message in history] == [{'source': 'api'}, {'steps': 2, 'score': 0.5}]
+
+
+@pytest.mark.asyncio
+async def test_conversation_store_stops_paging_at_limit(dynamodb_store):
+    """get_history reads no further pages once it has enough messages"""
+    store, client = dynamodb_store
+    client.query.return_value = {
+        'Items': [
+            {'role': {'S': 'assistant'}, 'content': {'S': 'b'}, 'timestamp': {'S': '2#9f0c'}},
+            {'role': {'S': 'user'}, 'content': {'S': 'a'}, 'timestamp': {'S': '1'}}
+        ],
+        'LastEvaluatedKey': {'session_id': {'S': 's1'}, 'timestamp': {'S': '1'}}
+    }
+    
+    history = await store.get_history("s1", limit=2, since='1')
+    
+    assert [(message['content'], message['timestamp']) for message in history] == [('a', '1'), ('b', '2')]
+    client.query.assert_called_once()
+    query = client.query.call_args.kwargs
+    assert query['KeyConditionExpression'] == '#s = :s AND #t >= :since'
+    assert query['ExpressionAttributeValues'] == {':s': {'S': 's1'}, ':since': {'S': '1'}}
+
+
+@pytest.mark.asyncio
+async def test_memory_store_bounds_history():
+    """The in-memory store keeps at most MAX_HISTORY messages per session"""
+    with patch('src.storage.memory_store.settings.MAX_HISTORY', 3):
+        store = MemoryConversationStore()
+        for index in range(5):
+            await store.add_message("s1", "user", str(index))
+    
+    history = await store.get_history("s1", limit=2)
+    
+    assert [message['content'] for message in history] == ['3', '4']
+    assert len(store.conversations["s1"]) == 3
+    assert store.sessions["s1"]['message_count'] == 5
+    
+    # Given timestamps are kept; generated ones use the same UTC format
+    await store.add_messages("s2", [
+        {'role': 'user', 'content': 'hi', 'timestamp': '2026-01-01T00:00:00.000000+00:00'},
+        {'role': 'assistant', 'content': 'hello'}
+    ])
+    user, assistant = store.conversations["s2"]
+    assert user['timestamp'] == '2026-01-01T00:00:00.000000+00:00'
+    assert assistant['timestamp'].endswith('+00:00') and len(assistant['timestamp']) == len(user['timestamp'])
+    
+    # Writes while a reader is suspended don't break iteration
+    reader = store.iter_history("s2")
+    assert (await reader.__anext__())['content'] == 'hello'
+    await store.add_message("s2", "user", "again")
+    assert [message['content'] async for message in reader] == ['hi']